@@ -9,6 +9,24 @@ export default async function handler(req, res) {
         return res.status(405).json({ error: "Method Not Allowed" });
     }
 
+    // 2. Prefer a running pipeline daemon (backend/main.py --daemon): no cold start
+    const DAEMON_TRIGGER_URL = process.env.DAEMON_TRIGGER_URL; // e.g. https://host:8787/trigger
+    if (DAEMON_TRIGGER_URL) {
+        try {
+            console.log(`[Relay] Triggering daemon sync at ${DAEMON_TRIGGER_URL}...`);
+            const response = await fetch(DAEMON_TRIGGER_URL, {
+                method: "POST",
+                headers: { "Authorization": `Bearer ${process.env.DAEMON_TRIGGER_TOKEN || ""}` },
+            });
+            if (response.status === 202) {
+                return res.status(200).json({ success: true, message: "Intelligence Sync Started" });
+            }
+            console.log(`[Relay] Daemon answered ${response.status}, falling back to GitHub Actions`);
+        } catch (err) {
+            console.log(`[Relay] Daemon unreachable (${err.message}), falling back to GitHub Actions`);
+        }
+    }
+
     const GITHUB_TOKEN = process.env.GITHUB_TOKEN; // Set this in Vercel Dashboard
     const REPO_OWNER = "Coder-Jay00";
     const REPO_NAME = "News";
@@ -36,7 +36,9 @@ data class Article(
     @SerialName("trust_reason")
     val trustReason: String? = null,
     @SerialName("related_links")
-    val relatedLinks: List<String>? = null
+    val relatedLinks: List<String>? = null,
+    // Reel stories carry a short plain-text teaser instead of the full ai_summary
+    val teaser: String? = null
 )
 
 // Feature 9: Morning Reel Model
@@ -560,7 +560,7 @@ fun MorningReelScreen(
                             
                             // Summary
                             Text(
-                                text = HtmlTextMapper.fromHtml(story.aiSummary ?: story.summary),
+                                text = HtmlTextMapper.fromHtml(story.teaser ?: story.aiSummary ?: story.summary),
                                 style = MaterialTheme.typography.bodyLarge,
                                 color = Color.LightGray,
                                 textAlign = androidx.compose.ui.text.style.TextAlign.Center,
@@ -0,0 +1,163 @@
+"""
+Persistent priority backlog for stories the LLM budget can't cover in one run.
+
+Every run ranks its new stories together with the ones left over from earlier
+runs and only analyzes the best LLM_STORY_BUDGET of them; the rest wait in a
+SQLite queue (next to the other pipeline state) instead of being shipped with
+the heuristic "analysis" or pushing the run into the NewsData fallback.
+Stories whose analysis fails (quota exhausted, bad output) go back in the
+queue too, up to BACKLOG_MAX_ATTEMPTS times.
+
+Priority of a story (a cluster from clustering.py, best member counts):
+- recency: halves every PRIORITY_HALF_LIFE_HOURS
+- source trust: the same prior the heuristic trust score uses
+- watchlist relevance: grows with the number of devices the story would alert
+- coverage: reported by several publishers
+Selection is greedy, and every story already picked from a category scales
+the next one from it down (CATEGORY_BALANCE), so one busy category can't take
+the whole budget. Stories older than BACKLOG_MAX_AGE_HOURS are dropped.
+"""
+
+import datetime
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from feed_stream import parse_date
+from intelligence_agent import source_trust_prior
+from local_state import state_path
+
+LLM_STORY_BUDGET = int(os.getenv("LLM_STORY_BUDGET", "40"))  # 0 = no limit
+BACKLOG_MAX_AGE_HOURS = float(os.getenv("BACKLOG_MAX_AGE_HOURS", "24"))
+BACKLOG_MAX_ATTEMPTS = int(os.getenv("BACKLOG_MAX_ATTEMPTS", "3"))
+PRIORITY_HALF_LIFE_HOURS = float(os.getenv("PRIORITY_HALF_LIFE_HOURS", "6"))
+CATEGORY_BALANCE = float(os.getenv("CATEGORY_BALANCE", "0.5"))
+
+WATCHLIST_WEIGHT = 0.5
+COVERAGE_WEIGHT = 0.25
+
+
+def article_age_hours(article: Dict, now: datetime.datetime) -> float:
+    published = parse_date(article.get("published"))
+    return max(0.0, (now - published).total_seconds() / 3600) if published else 0.0
+
+
+def priority_score(article: Dict, now: datetime.datetime, watchers: Callable[[str], int] = lambda text: 0,
+                   coverage: int = 1) -> float:
+    """Category-independent priority of one article (higher is analyzed sooner)."""
+    recency = 0.5 ** (article_age_hours(article, now) / PRIORITY_HALF_LIFE_HOURS)
+    trust = source_trust_prior(article.get("source", "")) / 100
+    alerted = watchers(f"{article.get('title', '')}\n{article.get('summary', '')}")
+    return (recency * trust * (1 + WATCHLIST_WEIGHT * math.log1p(alerted))
+            * (1 + COVERAGE_WEIGHT * (coverage - 1)))
+
+
+def select_stories(clusters: List[List[Dict]], budget: int = LLM_STORY_BUDGET,
+                   now: Optional[datetime.datetime] = None,
+                   watchers: Callable[[str], int] = lambda text: 0,
+                   balance: float = CATEGORY_BALANCE):
+    """
+    Splits clusters into (chosen, deferred). `chosen` is in priority order, balanced across
+    categories; `deferred` is everything past the budget.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    scored = []
+    for i, cluster in enumerate(clusters):
+        score = max(priority_score(a, now, watchers, coverage=len(cluster)) for a in cluster)
+        scored.append((score, i))
+    if budget <= 0 or len(clusters) <= budget:
+        budget = len(clusters)
+
+    # Best-first per category; each pick scales that category's next candidate down
+    by_category: Dict[str, List] = {}
+    for score, i in sorted(scored, key=lambda t: (-t[0], t[1])):
+        by_category.setdefault(clusters[i][0].get("category"), []).append((score, i))
+    picked_per_category = {category: 0 for category in by_category}
+
+    chosen = []
+    while len(chosen) < budget:
+        best = None
+        for category, queue in by_category.items():
+            if queue:
+                adjusted = queue[0][0] / (1 + balance * picked_per_category[category])
+                if best is None or adjusted > best[0]:
+                    best = (adjusted, category)
+        if best is None:
+            break
+        _, i = by_category[best[1]].pop(0)
+        picked_per_category[best[1]] += 1
+        chosen.append(i)
+
+    chosen_set = set(chosen)
+    return [clusters[i] for i in chosen], [c for i, c in enumerate(clusters) if i not in chosen_set]
+
+
+class BacklogQueue:
+    def __init__(self, path: Optional[str] = None, max_age_hours: float = BACKLOG_MAX_AGE_HOURS,
+                 max_attempts: int = BACKLOG_MAX_ATTEMPTS):
+        self.path = path or state_path("backlog.sqlite3")
+        self.max_age_hours = max_age_hours
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            create table if not exists backlog (
+                link text primary key,
+                article text not null,
+                attempts integer not null default 0,
+                enqueued_at real not null
+            )
+        """)
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("select count(*) from backlog").fetchone()[0]
+
+    def articles(self, now: Optional[datetime.datetime] = None) -> List[Dict]:
+        """Everything waiting, minus (and deleting) stories that fell out of the freshness window."""
+        now = now or datetime.datetime.now(datetime.timezone.utc)
+        with self._lock:
+            rows = self._conn.execute("select link, article from backlog").fetchall()
+        articles, expired = [], []
+        for link, data in rows:
+            article = json.loads(data)
+            if article_age_hours(article, now) > self.max_age_hours:
+                expired.append(link)
+            else:
+                articles.append(article)
+        if expired:
+            print(f"Backlog: dropping {len(expired)} stories older than {self.max_age_hours:.0f}h.")
+            self.remove(expired)
+        return articles
+
+    def push(self, articles: Iterable[Dict], failed: bool = False) -> List[Dict]:
+        """
+        Queues (or re-queues) articles. With `failed`, each counts an attempt; articles out of
+        attempts are not queued and are returned so the caller can ship them as they are.
+        """
+        given_up = []
+        with self._lock:
+            for article in articles:
+                row = self._conn.execute("select attempts from backlog where link = ?", (article['link'],)).fetchone()
+                attempts = (row[0] if row else 0) + int(failed)
+                if attempts >= self.max_attempts:
+                    self._conn.execute("delete from backlog where link = ?", (article['link'],))
+                    given_up.append(article)
+                    continue
+                clean = {k: v for k, v in article.items() if k != "_unanalyzed"}
+                self._conn.execute(
+                    "insert or replace into backlog (link, article, attempts, enqueued_at) values (?, ?, ?, ?)",
+                    (article['link'], json.dumps(clean), attempts, time.time())
+                )
+            self._conn.commit()
+        return given_up
+
+    def remove(self, links: Iterable[str]):
+        with self._lock:
+            self._conn.executemany("delete from backlog where link = ?", [(link,) for link in links])
+            self._conn.commit()
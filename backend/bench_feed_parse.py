@@ -0,0 +1,81 @@
+"""
+Micro-benchmark: streaming feed parse (feed_stream.py) vs. full feedparser parse.
+
+Uses recorded bodies from bench_fixtures/ when present, otherwise synthesized
+feeds (see benchmark.synthesize_feed) with --items entries each, and reports
+CPU time and peak Python memory per feed for both paths, plus whether they
+return the same links.
+
+Run:
+    python backend/bench_feed_parse.py --items 300
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark import FIXTURES_DIR, synthesize_feed  # noqa: E402
+from feed_stream import FeedFormatError, feedparser_entries, fresh_entries  # noqa: E402
+
+_CHUNK = 64 * 1024
+
+
+def _measure(fn):
+    tracemalloc.start()
+    start = time.process_time()
+    result = fn()
+    cpu = time.process_time() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, cpu, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare streaming and feedparser feed parsing")
+    parser.add_argument("--items", type=int, default=300, help="Entries per synthesized feed")
+    parser.add_argument("--feeds", type=int, default=10, help="Synthesized feeds when no fixtures exist")
+    args = parser.parse_args()
+
+    bodies = []
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "*.xml"))):
+        with open(path, "rb") as f:
+            bodies.append(f.read())
+    if not bodies:
+        bodies = [synthesize_feed(f"https://bench-{i}.example/feed", items=args.items) for i in range(args.feeds)]
+
+    totals = {"stream_cpu": 0.0, "feedparser_cpu": 0.0, "stream_peak": 0, "feedparser_peak": 0,
+              "fallbacks": 0, "mismatches": 0}
+    for body in bodies:
+        chunks = lambda: (body[i:i + _CHUNK] for i in range(0, len(body), _CHUNK))
+        try:
+            streamed, cpu, peak = _measure(lambda: fresh_entries(chunks()))
+        except FeedFormatError:
+            totals["fallbacks"] += 1
+            streamed, cpu, peak = _measure(lambda: feedparser_entries(body))
+        full, fp_cpu, fp_peak = _measure(lambda: feedparser_entries(body))
+        totals["stream_cpu"] += cpu
+        totals["feedparser_cpu"] += fp_cpu
+        totals["stream_peak"] = max(totals["stream_peak"], peak)
+        totals["feedparser_peak"] = max(totals["feedparser_peak"], fp_peak)
+        totals["mismatches"] += [e["link"] for e in streamed] != [e["link"] for e in full]
+
+    print(json.dumps({
+        "feeds": len(bodies),
+        "bytes": sum(len(b) for b in bodies),
+        "stream_cpu_ms": round(totals["stream_cpu"] * 1000, 1),
+        "feedparser_cpu_ms": round(totals["feedparser_cpu"] * 1000, 1),
+        "stream_peak_kb": round(totals["stream_peak"] / 1024),
+        "feedparser_peak_kb": round(totals["feedparser_peak"] / 1024),
+        "fallbacks": totals["fallbacks"],
+        "link_mismatches": totals["mismatches"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
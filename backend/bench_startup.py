@@ -0,0 +1,104 @@
+"""
+Startup-latency guard for the backend entry points.
+
+For each entry point it runs `python -X importtime -c "import <module>"` in a
+fresh interpreter and reports the cumulative import time. It then builds
+main.Pipeline (the first thing a run does) and checks that no heavy SDK has
+been loaded yet. Exits non-zero when an entry point is over budget or pulls
+in an SDK eagerly, so it can gate CI.
+
+Run:
+    python backend/bench_startup.py --budget-ms 400
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ENTRY_POINTS = ["main", "force_reel", "trigger_update", "debug_agent"]
+# Loaded only by the stage that needs them
+HEAVY_MODULES = ["google.generativeai", "supabase", "firebase_admin"]
+
+# Stands in for the CI secrets so DatabaseManager/IntelligenceAgent can be constructed offline
+_FAKE_ENV = {
+    "SUPABASE_URL": "https://startup.supabase.local",
+    "SUPABASE_KEY": "startup-key",
+    "GEMINI_API_KEY": "startup-key",
+}
+
+
+def _env() -> dict:
+    env = dict(os.environ, **_FAKE_ENV)
+    env["BRIEF_CACHE_DIR"] = tempfile.mkdtemp(prefix="brief-startup-")
+    return env
+
+
+def import_time(module: str) -> dict:
+    """Cumulative import time of `module` and which heavy SDKs it loaded."""
+    code = f"import sys; import {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=BACKEND_DIR,
+                          env=_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+
+    # Children are printed before their parent; collect `module`'s direct imports
+    total_us, children, slowest = 0, [], []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # Header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            children.append((int(cumulative), name.strip()))
+        elif depth == 0:
+            if name.strip() == module:
+                total_us, slowest = int(cumulative), children
+            children = []
+    heavy = [m for m in proc.stdout.strip().split(",") if m]
+    return {
+        "module": module,
+        "import_ms": round(total_us / 1000, 1),
+        "heavy_loaded": heavy,
+        "slowest": [f"{name} {us / 1000:.1f}ms" for us, name in sorted(slowest, reverse=True)[:5]],
+    }
+
+
+def pipeline_startup() -> dict:
+    """Heavy SDKs loaded after building main.Pipeline (the no-op path runs on just this)."""
+    code = ("import json, sys, time; t = time.perf_counter(); import main; main.Pipeline(); "
+            "print(json.dumps({'startup_ms': round((time.perf_counter() - t) * 1000, 1), "
+            f"'heavy_loaded': [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))")
+    proc = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Pipeline() failed:\n{proc.stderr[-2000:]}")
+    # The pipeline prints its own progress lines first
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Guard entry-point import time")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "400")),
+                        help="Max cumulative import time per entry point")
+    args = parser.parse_args()
+
+    results = [import_time(m) for m in ENTRY_POINTS]
+    pipeline = pipeline_startup()
+    failures = [f"{r['module']}: {r['import_ms']}ms > {args.budget_ms}ms" for r in results if r["import_ms"] > args.budget_ms]
+    failures += [f"{r['module']}: loads {', '.join(r['heavy_loaded'])} at import" for r in results if r["heavy_loaded"]]
+    if pipeline["heavy_loaded"]:
+        failures.append(f"main.Pipeline(): loads {', '.join(pipeline['heavy_loaded'])} before any stage runs")
+
+    print(json.dumps({"budget_ms": args.budget_ms, "entry_points": results, "pipeline": pipeline,
+                      "failures": failures}, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
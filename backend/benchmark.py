@@ -0,0 +1,487 @@
+"""
+Offline end-to-end benchmark for the Daily Brief pipeline.
+
+Runs `main.main()` with every external service replaced by a local stand-in:
+- RSS:      bodies replayed from bench_fixtures/feeds/ (record them with --record),
+            or synthesized deterministically for any source without a recording
+- Gemini:   FakeGenerativeModel with configurable latency and error rate
+- Supabase: FakeSupabaseClient, an in-memory table store
+- FCM:      FakeMessaging, which only counts sends
+
+Reports per-stage wall time (from instrumentation.py spans), requests issued
+per service and peak memory.
+
+Usage (from the repo root):
+    python backend/benchmark.py
+    python backend/benchmark.py --llm-latency 1.5 --llm-error-rate 0.1 --output bench.json
+    python backend/benchmark.py --record   # one-off, needs network
+"""
+
+import argparse
+import contextlib
+import datetime
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+from email.utils import format_datetime
+from types import SimpleNamespace
+from unittest import mock
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BACKEND_DIR, "bench_fixtures", "feeds")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+class Counters:
+    """Thread-safe request counters shared by all fakes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {}
+
+    def add(self, name: str, amount: int = 1):
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + amount
+
+
+# --- RSS --------------------------------------------------------------------
+
+_WORDS = ("chip cloud model startup security breach election market rally launch vaccine league "
+          "climate quantum robot court budget satellite merger outage policy lab").split()
+
+
+def fixture_path(url: str) -> str:
+    return os.path.join(FIXTURES_DIR, hashlib.sha256(url.encode()).hexdigest()[:16] + ".xml")
+
+
+def synthesize_feed(url: str, items: int = 20, now: datetime.datetime = None) -> bytes:
+    """Deterministic RSS 2.0 body; ~1/3 of stories recur across feeds to exercise clustering."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    rng = random.Random(url)
+    entries = []
+    for i in range(items):
+        if i % 3 == 0:
+            seed = f"shared-{i}"  # Same story under every publisher
+        else:
+            seed = f"{url}-{i}"
+        story = random.Random(seed)
+        words = story.sample(_WORDS, 6)
+        title = f"{words[0].capitalize()} {words[1]} {words[2]} sparks {words[3]} {words[4]} debate"
+        summary = f"<p>{' '.join(story.choice(_WORDS) for _ in range(80))}</p>"
+        published = now - datetime.timedelta(minutes=rng.randint(5, 60 * 30))
+        link = f"{url.rstrip('/')}/story/{hashlib.md5(seed.encode()).hexdigest()[:10]}?utm_source=rss"
+        entries.append(
+            f"<item><title>{title}</title><link>{link}</link>"
+            f"<description><![CDATA[{summary}]]></description>"
+            f"<pubDate>{format_datetime(published)}</pubDate></item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>{url}</title><link>{url}</link><description>bench</description>"
+        + "".join(entries) + "</channel></rss>"
+    ).encode("utf-8")
+
+
+class FakeResponse:
+    def __init__(self, url: str, body: bytes, status_code: int = 200):
+        self.url = url
+        self.content = body
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self.headers = {"Content-Type": "application/rss+xml"}
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int = 1024):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FeedReplayer:
+    """Stands in for requests.Session.get (http_client): replays recorded or synthesized feed bodies."""
+
+    def __init__(self, counters: Counters, latency: float):
+        self.counters = counters
+        self.latency = latency
+
+    def __call__(self, url, headers=None, timeout=None, **kwargs):
+        self.counters.add("http_requests")
+        time.sleep(self.latency * random.uniform(0.5, 1.5))
+        if "newsdata.io" in url:
+            return FakeResponse(url, json.dumps({"results": []}).encode())
+        path = fixture_path(url)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                body = f.read()
+        else:
+            body = synthesize_feed(url)
+        self.counters.add("http_bytes", len(body))
+        return FakeResponse(url, body)
+
+
+def record_fixtures(urls):
+    """Downloads the live bodies once so later runs replay real-world XML."""
+    import requests
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"}
+    for url in urls:
+        try:
+            response = requests.get(url, headers=headers, timeout=15)
+            with open(fixture_path(url), "wb") as f:
+                f.write(response.content)
+            print(f"Recorded {url} ({len(response.content)} bytes)")
+        except Exception as e:
+            print(f"Failed to record {url}: {e}")
+
+
+# --- Gemini -----------------------------------------------------------------
+
+class FakeGenerativeModel:
+    """Stands in for genai.GenerativeModel with configurable latency and failures."""
+
+    def __init__(self, counters: Counters, latency: float, error_rate: float, rate_limit_rate: float):
+        self.counters = counters
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._rng = random.Random(42)
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, **kwargs):
+        self.counters.add("llm_calls")
+        self.counters.add("llm_prompt_chars", len(prompt))
+        with self._lock:
+            roll = self._rng.random()
+        time.sleep(self.latency * random.uniform(0.7, 1.3))
+        if roll < self.rate_limit_rate:
+            self.counters.add("llm_rate_limited")
+            raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.counters.add("llm_errors")
+            raise RuntimeError("500 Internal error encountered.")
+
+        analysis = {
+            "summary": "<b>The Core Story</b><br>" + "Benchmark analysis text. " * 40,
+            "trust_badge": "News",
+            "icon": "globe",
+            "trust_score": 80,
+            "trust_reason": "Benchmark fixture."
+        }
+        indices = [int(i) for i in re.findall(r"^\s*\[(\d+)\] Title:", prompt, re.MULTILINE)]
+        if "SYNTHESIZE COMMAND" in prompt:
+            payload = dict(analysis, title="Synthesized benchmark story", icon="layers")
+        elif indices:
+            payload = [dict(analysis, index=i) for i in indices]
+        else:
+            payload = analysis
+        # Schema-constrained calls (generation_config) answer bare JSON, prompt-only ones fence it
+        text = json.dumps(payload)
+        if not kwargs.get("generation_config"):
+            text = "```json\n" + text + "\n```"
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+
+# --- Supabase ---------------------------------------------------------------
+
+class FakeQuery:
+    """Just enough of the postgrest query builder for the pipeline."""
+
+    def __init__(self, client, table: str):
+        self.client = client
+        self.table = table
+        self.op = "select"
+        self.columns = None
+        self.filters = []
+        self.order_by = None
+        self.limit_n = None
+        self.payload = None
+
+    def select(self, columns="*", **kwargs):
+        self.columns = None if columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda r: r.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda r: r.get(column) in values)
+        return self
+
+    def ov(self, column, values):
+        values = set(values)
+        self.filters.append(lambda r: bool(values.intersection(r.get(column) or [])))
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and str(r.get(column)) < str(value))
+        return self
+
+    def gte(self, column, value):
+        self.filters.append(lambda r: r.get(column) is not None and str(r.get(column)) >= str(value))
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self.order_by = (column, desc)
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def range(self, start, end):
+        self.offset = (start, end)
+        return self
+
+    def upsert(self, rows, on_conflict="id", **kwargs):
+        self.op, self.payload, self.conflict = "upsert", rows if isinstance(rows, list) else [rows], on_conflict
+        return self
+
+    def insert(self, rows, **kwargs):
+        self.op, self.payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def delete(self, **kwargs):
+        self.op = "delete"
+        return self
+
+    def execute(self):
+        return self.client._execute(self)
+
+
+class FakeSupabaseClient:
+    """In-memory stand-in for supabase.Client with per-request latency."""
+
+    def __init__(self, counters: Counters, latency: float, seed_rows=None):
+        self.counters = counters
+        self.latency = latency
+        self.tables = {"articles": [self._generated("articles", r) for r in seed_rows or []],
+                       "daily_briefings": [], "user_watchlists": []}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _generated(table, row):
+        """Fills generated columns the way Postgres would (articles.link_key)."""
+        row = dict(row)
+        if table == "articles" and row.get("link"):
+            row["link_key"] = hashlib.md5((row.get("canonical_link") or row["link"]).encode("utf-8")).hexdigest()
+        return row
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name, params=None):
+        client = self
+
+        class _Rpc:
+            def execute(self_inner):
+                client.counters.add("db_requests")
+                time.sleep(client.latency)
+                if name == "reel_candidates":
+                    from reel_builder import rank_best_per_category
+                    with client._lock:
+                        rows = list(client.tables["articles"])
+                    return SimpleNamespace(data=rank_best_per_category(rows, params["categories"], params.get("per_category", 3)))
+                return SimpleNamespace(data=[])
+
+        return _Rpc()
+
+    def _execute(self, q: FakeQuery):
+        self.counters.add("db_requests")
+        time.sleep(self.latency)
+        with self._lock:
+            rows = self.tables.setdefault(q.table, [])
+            if q.op in ("upsert", "insert"):
+                self.counters.add("db_rows_written", len(q.payload))
+                self.counters.add("db_bytes_written", len(json.dumps(q.payload, default=str)))
+                key = getattr(q, "conflict", None)
+                for row in q.payload:
+                    row = self._generated(q.table, row)
+                    match = next((i for i, r in enumerate(rows) if key and r.get(key) == row.get(key)), None)
+                    if match is None:
+                        row.setdefault("id", str(uuid.uuid4()))  # Column default
+                        rows.append(row)
+                    else:
+                        rows[match].update(row)
+                return SimpleNamespace(data=q.payload)
+            matched = [r for r in rows if all(f(r) for f in q.filters)]
+            if q.op == "delete":
+                self.tables[q.table] = [r for r in rows if r not in matched]
+                return SimpleNamespace(data=matched)
+            if q.order_by:
+                col, desc = q.order_by
+                matched.sort(key=lambda r: (r.get(col) is not None, r.get(col) or 0), reverse=desc)
+            if getattr(q, "offset", None):
+                matched = matched[q.offset[0]:q.offset[1] + 1]
+            if q.limit_n is not None:
+                matched = matched[:q.limit_n]
+            if q.columns:
+                matched = [{c: r.get(c) for c in q.columns} for r in matched]
+            else:
+                matched = [dict(r) for r in matched]
+            self.counters.add("db_bytes_read", len(json.dumps(matched, default=str)))
+            return SimpleNamespace(data=matched)
+
+
+# --- FCM --------------------------------------------------------------------
+
+class FakeMessaging:
+    """Stands in for firebase_admin.messaging; every constructor returns its kwargs."""
+
+    def __init__(self, counters: Counters):
+        self.counters = counters
+        for name in ("Message", "Notification", "AndroidConfig", "AndroidNotification", "MulticastMessage"):
+            setattr(self, name, lambda **kwargs: SimpleNamespace(**kwargs))
+
+    def send(self, message, **kwargs):
+        self.counters.add("fcm_requests")
+        return "bench-message-id"
+
+    def send_each(self, messages, **kwargs):
+        self.counters.add("fcm_requests")
+        return SimpleNamespace(success_count=len(messages), failure_count=0, responses=[])
+
+
+# --- Harness ----------------------------------------------------------------
+
+def run_benchmark(args) -> dict:
+    counters = Counters()
+
+    # Fresh local state and fake credentials so nothing real is touched
+    cache_dir = tempfile.mkdtemp(prefix="brief-bench-")
+    os.environ.update({
+        "BRIEF_CACHE_DIR": cache_dir,
+        "GEMINI_API_KEY": "bench-key",
+        "SUPABASE_URL": "https://bench.supabase.local",
+        "SUPABASE_KEY": "bench-key",
+        "GEMINI_RPM": str(args.rpm),
+        "HTTP_HTTP2": "0",
+    })
+    os.environ.pop("NEWSDATA_API_KEY", None)
+
+    # Imported only now: the modules read their env tuning at import time
+    import main as pipeline
+
+    from ingestion_engine import IngestionEngine
+    from url_canon import canonical_url
+    urls = [s["url"] for s in IngestionEngine(use_feed_cache=False).sources["friendly_sources"]]
+    # Pre-seed some of today's links so the dedup filter has work to do
+    seed = []
+    for url in urls[:int(len(urls) * args.existing_ratio)]:
+        first_link = re.search(rb"<item><title>[^<]*</title><link>([^<]+)</link>", synthesize_feed(url)).group(1)
+        seed.append({"link": first_link.decode(), "canonical_link": canonical_url(first_link.decode()),
+                     "title": "seed", "category": "Technology",
+                     "published": datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")})
+
+    fake_model = FakeGenerativeModel(counters, args.llm_latency, args.llm_error_rate, args.llm_rate_limit_rate)
+    fake_db = FakeSupabaseClient(counters, args.db_latency, seed)
+    fake_messaging = FakeMessaging(counters)
+    watch_rows = [{"user_fcm_token": f"token-{i}", "keyword": random.Random(i).choice(_WORDS)}
+                  for i in range(args.watchlists)]
+    fake_db.tables["user_watchlists"] = watch_rows
+
+    patches = [
+        # http_client's requests transport (HTTP_HTTP2=0 above keeps httpx out of the way)
+        mock.patch("requests.Session.get", FeedReplayer(counters, args.feed_latency)),
+        mock.patch("google.generativeai.configure", lambda **kwargs: None),
+        mock.patch("google.generativeai.GenerativeModel", lambda *a, **k: fake_model),
+        mock.patch("database_manager.create_client", lambda url, key: fake_db),
+        mock.patch("push_notifier.init_firebase", lambda: True),
+        mock.patch("push_notifier.messaging", fake_messaging, create=True),
+    ]
+
+    if args.trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    error = None
+    with contextlib.ExitStack() as stack:
+        for p in patches:
+            stack.enter_context(p)
+        out = io.StringIO()
+        stack.enter_context(contextlib.redirect_stdout(sys.stdout if args.verbose else out))
+        try:
+            pipeline.main()
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+    total = time.perf_counter() - start
+    peak = None
+    if args.trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    # Stage timings and pipeline-side counters come from the run's own instrumentation
+    from instrumentation import metrics
+    run_report = metrics.last_report or {}
+
+    return {
+        "total_seconds": round(total, 3),
+        "status": run_report.get("status"),
+        "stages_seconds": {k: v["seconds"] for k, v in run_report.get("stages", {}).items()},
+        "pipeline_counters": run_report.get("counters", {}),
+        "requests": dict(sorted(counters.values.items())),
+        "articles_stored": len(fake_db.tables["articles"]) - len(seed),
+        "peak_python_memory_mb": round(peak / 1e6, 2) if peak is not None else None,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "error": error,
+        "config": vars(args),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--feed-latency", type=float, default=0.3, help="Mean seconds per feed request")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Mean seconds per Gemini call")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of Gemini calls that fail with a 500")
+    parser.add_argument("--llm-rate-limit-rate", type=float, default=0.0, help="Fraction of Gemini calls that fail with a 429")
+    parser.add_argument("--rpm", type=float, default=600, help="GEMINI_RPM quota used by the rate limiter")
+    parser.add_argument("--db-latency", type=float, default=0.05, help="Seconds per Supabase round trip")
+    parser.add_argument("--existing-ratio", type=float, default=0.3, help="Fraction of feeds whose top story is already in the DB")
+    parser.add_argument("--watchlists", type=int, default=200, help="Number of user_watchlists rows")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Measure peak Python heap with tracemalloc (slows every stage ~5-10x)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    parser.add_argument("--record", action="store_true", help="Download live feed bodies into bench_fixtures/ and exit")
+    args = parser.parse_args()
+
+    if args.record:
+        from ingestion_engine import IngestionEngine
+        record_fixtures([s["url"] for s in IngestionEngine(use_feed_cache=False).sources["friendly_sources"]])
+        return
+
+    report = run_benchmark(args)
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    if report["error"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
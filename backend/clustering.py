@@ -0,0 +1,89 @@
+"""
+Near-duplicate clustering (MinHash + LSH) for freshly ingested articles.
+
+BBC, Al Jazeera, CNBC and Bing often carry the same event. Grouping them before
+the intelligence layer lets one synthesize_cluster call replace N separate
+analyses, and the merged story records its sources in `related_links`.
+"""
+
+import hashlib
+import os
+import re
+from typing import Dict, List
+
+# Estimated Jaccard similarity above which two articles are treated as the same story
+CLUSTER_SIMILARITY = float(os.getenv("CLUSTER_SIMILARITY", "0.5"))
+
+NUM_PERMUTATIONS = 64
+BANDS = 16  # 16 bands x 4 rows: ~50% similar pairs collide in at least one band ~98% of the time
+ROWS_PER_BAND = NUM_PERMUTATIONS // BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Fixed seeds so signatures are stable across runs and machines
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME | 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _MERSENNE_PRIME)
+    for i in range(NUM_PERMUTATIONS)
+]
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_TAG_RE = re.compile(r"<[^>]+>")
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "for", "with", "at", "by", "from",
+    "is", "are", "was", "were", "be", "as", "it", "its", "this", "that", "after", "over", "new",
+    "says", "said", "will", "has", "have", "but", "not", "up", "out", "how", "what", "why",
+}
+
+
+def shingles(article: Dict) -> set:
+    """Word unigrams + bigrams of the title and the start of the summary."""
+    text = f"{article.get('title', '')} {_TAG_RE.sub(' ', article.get('summary') or '')[:300]}".lower()
+    words = [w for w in _WORD_RE.findall(text) if w not in _STOPWORDS]
+    grams = set(words)
+    grams.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    return grams
+
+
+def minhash(features: set) -> List[int]:
+    if not features:
+        return [_MAX_HASH] * NUM_PERMUTATIONS
+    hashed = [int.from_bytes(hashlib.blake2b(f.encode(), digest_size=8).digest(), "big") for f in features]
+    return [min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashed) for a, b in _PERMUTATIONS]
+
+
+def estimated_similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERMUTATIONS
+
+
+def cluster_articles(articles: List[Dict], threshold: float = CLUSTER_SIMILARITY) -> List[List[Dict]]:
+    """
+    Groups near-duplicate articles. Returns a list of clusters (singletons included)
+    in the order their first member appears in `articles`.
+    """
+    signatures = [minhash(shingles(a)) for a in articles]
+    parent = list(range(len(articles)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    # LSH: only pairs that share a band bucket are compared
+    for band in range(BANDS):
+        buckets: Dict[tuple, List[int]] = {}
+        lo, hi = band * ROWS_PER_BAND, (band + 1) * ROWS_PER_BAND
+        for i, sig in enumerate(signatures):
+            buckets.setdefault(tuple(sig[lo:hi]), []).append(i)
+        for members in buckets.values():
+            for j in members[1:]:
+                root_i, root_j = find(members[0]), find(j)
+                if root_i != root_j and estimated_similarity(signatures[members[0]], signatures[j]) >= threshold:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters: Dict[int, List[Dict]] = {}
+    for i, article in enumerate(articles):
+        clusters.setdefault(find(i), []).append(article)
+    return list(clusters.values())
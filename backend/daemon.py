@@ -0,0 +1,196 @@
+"""
+Long-running mode: `python backend/main.py --daemon`.
+
+A cron run pays for interpreter start, the heavy SDK imports, fresh clients and
+Firebase init every time. The daemon pays once and keeps one warm `Pipeline`:
+- each source is polled on its own interval (a source's "interval_minutes", else
+  DAEMON_SOURCE_INTERVAL_MINUTES), +/- DAEMON_JITTER so feeds drift apart
+- new articles are collected and handed to the pipeline stages at most every
+  DAEMON_MIN_RUN_GAP_MINUTES, each batch as its own run (journal + run report)
+- a manual sync (what api/trigger-sync.js relays) polls every source now and
+  runs right away: POST /trigger on DAEMON_PORT, or SIGUSR1
+"""
+
+import heapq
+import hmac
+import json
+import os
+import random
+import signal
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+DAEMON_SOURCE_INTERVAL_MINUTES = float(os.getenv("DAEMON_SOURCE_INTERVAL_MINUTES", "30"))
+DAEMON_JITTER = float(os.getenv("DAEMON_JITTER", "0.2"))
+DAEMON_MIN_RUN_GAP_MINUTES = float(os.getenv("DAEMON_MIN_RUN_GAP_MINUTES", "10"))
+DAEMON_PORT = int(os.getenv("DAEMON_PORT", "0"))  # 0 = no HTTP trigger endpoint
+DAEMON_TRIGGER_TOKEN = os.getenv("DAEMON_TRIGGER_TOKEN")
+
+
+class SourceSchedule:
+    """Min-heap of (next poll time, source index) on the monotonic clock."""
+
+    def __init__(self, sources: List[Dict], default_interval_minutes: float = DAEMON_SOURCE_INTERVAL_MINUTES,
+                 jitter: float = DAEMON_JITTER, rng: Optional[random.Random] = None):
+        self.sources = sources
+        self.default_interval = default_interval_minutes * 60
+        self.jitter = jitter
+        self.rng = rng or random.Random()
+        # Everything is due at startup, like a cron run; jitter spreads the polls out from there
+        now = time.monotonic()
+        self._heap = [(now, i) for i in range(len(sources))]
+        heapq.heapify(self._heap)
+
+    def interval(self, source: Dict) -> float:
+        base = float(source.get("interval_minutes", 0)) * 60 or self.default_interval
+        return base * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    def pop_due(self, now: float, everything: bool = False) -> List[Dict]:
+        """Sources due by `now` (or all of them), rescheduled for their next poll."""
+        due = []
+        while self._heap and (everything or self._heap[0][0] <= now):
+            _, i = heapq.heappop(self._heap)
+            due.append(i)
+        for i in due:
+            heapq.heappush(self._heap, (now + self.interval(self.sources[i]), i))
+        return [self.sources[i] for i in sorted(due)]
+
+    def seconds_until_next(self, now: float) -> float:
+        return max(0.0, self._heap[0][0] - now) if self._heap else self.default_interval
+
+
+class BriefDaemon:
+    def __init__(self, pipeline, run: Callable, schedule: Optional[SourceSchedule] = None,
+                 min_run_gap_minutes: float = DAEMON_MIN_RUN_GAP_MINUTES):
+        """
+        `pipeline` is a warm main.Pipeline; `run(run_id=, pipeline=, raw_articles=)` is main.main,
+        which wraps each batch with its journal and run report.
+        """
+        self.pipeline = pipeline
+        self.run = run
+        self.schedule = schedule or SourceSchedule(pipeline.ingestion.sources["friendly_sources"])
+        self.min_run_gap = min_run_gap_minutes * 60
+        self.pending: Dict[str, Dict] = {}  # link -> article, so overlapping polls don't double up
+        self.last_run_at = float("-inf")
+        self.last_status = None
+        self.runs = 0
+        self._manual = False
+        self._trigger = threading.Event()
+        self._stop = threading.Event()
+
+    # --- Triggers ---
+
+    def trigger(self):
+        """Manual sync: poll every source now and run without waiting for the gap."""
+        self._manual = True
+        self._trigger.set()
+
+    def stop(self, *_):
+        self._stop.set()
+        self._trigger.set()
+
+    def _install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda *_: self.trigger())
+
+    def _start_http(self, port: int):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, code: int, body: Dict):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                if self.path != "/health":
+                    return self._reply(404, {"error": "not found"})
+                self._reply(200, {"pending": len(daemon.pending), "runs": daemon.runs, "last_status": daemon.last_status})
+
+            def do_POST(self):
+                if self.path != "/trigger":
+                    return self._reply(404, {"error": "not found"})
+                if DAEMON_TRIGGER_TOKEN and not hmac.compare_digest(
+                        self.headers.get("Authorization", ""), f"Bearer {DAEMON_TRIGGER_TOKEN}"):
+                    return self._reply(401, {"error": "unauthorized"})
+                daemon.trigger()
+                self._reply(202, {"success": True, "message": "Intelligence Sync Started"})
+
+            def log_message(self, fmt, *args):
+                print(f"[daemon] http {self.address_string()} {fmt % args}")
+
+        # Each trigger skips the run gap and spends LLM quota: without a token, only local callers
+        host = "0.0.0.0" if DAEMON_TRIGGER_TOKEN else "127.0.0.1"
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"[daemon] Trigger endpoint listening on {host}:{port} (POST /trigger, GET /health)")
+        if not DAEMON_TRIGGER_TOKEN:
+            print("[daemon] DAEMON_TRIGGER_TOKEN is not set, so the endpoint only accepts local connections.")
+        return server
+
+    # --- Loop ---
+
+    def tick(self, now: Optional[float] = None) -> Optional[str]:
+        """One scheduling step: poll due sources, then run if a batch is ready. Returns the run status."""
+        now = time.monotonic() if now is None else now
+        manual, self._manual = self._manual, False
+
+        due = self.schedule.pop_due(now, everything=manual)
+        # Feeds failing in a row sit out their backoff (see source_health.py); a manual sync still tries them
+        if not manual:
+            due = [s for s in due if not self.pipeline.ingestion.scheduler.backed_off(s)]
+        if due:
+            print(f"[daemon] Polling {len(due)} source(s): {', '.join(s.get('source', s['url']) for s in due)}")
+            for feed_articles in self.pipeline.ingestion.fetch_feeds_concurrently(due):
+                for art in feed_articles:
+                    self.pending.setdefault(art['link'], art)
+
+        if not self.pending or (not manual and now - self.last_run_at < self.min_run_gap):
+            return None
+
+        batch = list(self.pending.values())
+        self.pending = {}
+        self.last_run_at = now
+        self.runs += 1
+        try:
+            self.last_status = self.run(run_id=uuid.uuid4().hex[:12], pipeline=self.pipeline, raw_articles=batch)
+        except Exception as e:
+            # Keep serving; the batch goes back in the queue (the LLM cache makes the redo cheap)
+            print(f"[daemon] Run failed: {e}")
+            self.last_status = "failed"
+            for art in batch:
+                self.pending.setdefault(art['link'], art)
+        return self.last_status
+
+    def _wait_seconds(self, now: float) -> float:
+        wait = self.schedule.seconds_until_next(now)
+        if self.pending:
+            wait = min(wait, max(0.0, self.last_run_at + self.min_run_gap - now))
+        return max(1.0, wait)
+
+    def run_forever(self, port: int = DAEMON_PORT):
+        self._install_signal_handlers()
+        server = self._start_http(port) if port else None
+        print(f"[daemon] Watching {len(self.schedule.sources)} sources "
+              f"(every ~{self.schedule.default_interval / 60:.0f} min, +/-{self.schedule.jitter:.0%})")
+        try:
+            while not self._stop.is_set():
+                self.tick()
+                self._trigger.wait(timeout=self._wait_seconds(time.monotonic()))
+                self._trigger.clear()
+        finally:
+            if server:
+                server.shutdown()
+            print("[daemon] Stopped.")
+
+
+def run_daemon(pipeline, run: Callable):
+    BriefDaemon(pipeline, run).run_forever()
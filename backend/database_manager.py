@@ -1,8 +1,183 @@
-from supabase import create_client, Client
 import os
+import json
+import threading
+import time
 import datetime
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional
 from dotenv import load_dotenv
+from instrumentation import metrics
+from link_index import LinkIndex
+from url_canon import canonical_url, link_key
+from retention import ArticleArchive, purge_articles, RETENTION_ARCHIVE_DIR
+
+# Columns of the 'articles' table (schema.sql); anything else is dropped before upload
+ARTICLE_COLUMNS = {
+    "id", "title", "summary", "source", "published", "category", "trust_badge", "icon",
+    "link", "ai_summary", "tier", "trust_score", "trust_reason", "related_links", "label_source",
+    "canonical_link"
+}
+
+# Named column sets for reads; select the smallest one the caller renders
+PROJECTIONS = {
+    # Feed list cards: no raw RSS summary, trust reasoning or merged links
+    "card": ["id", "title", "source", "published", "category", "trust_badge", "icon", "link",
+             "tier", "trust_score", "ai_summary"],
+    # Reel picks: ai_summary is only read to cut a teaser (see reel_builder.story_ref)
+    "reel": ["id", "title", "link", "source", "category", "published", "trust_score", "trust_badge",
+             "icon", "ai_summary"],
+    "detail": sorted(ARTICLE_COLUMNS),
+    # Training rows for the local label model (see label_model.py)
+    "labels": ["link", "title", "summary", "source", "category", "trust_badge", "icon", "trust_score",
+               "trust_reason", "ai_summary", "label_source"],
+}
+
+
+def projection(name: str) -> str:
+    """Column list for `select()`, e.g. projection("card")."""
+    return ",".join(PROJECTIONS[name])
+
+# ArticleWriter flush thresholds
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "20"))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+UPLOAD_FLUSH_SECONDS = float(os.getenv("UPLOAD_FLUSH_SECONDS", "15"))
+
+
+def _is_row_error(error: Exception) -> bool:
+    """True if a smaller batch can get past the error: bad data/constraint (SQLSTATE 22/23) or a 4xx."""
+    try:
+        from postgrest.exceptions import APIError
+    except ImportError:
+        return False
+    if not isinstance(error, APIError):
+        return False  # Transport: timeout, connection refused, ...
+    code = str(error.code or "")
+    if code.isdigit() and len(code) == 3:
+        # Non-JSON error pages carry the HTTP status
+        return code.startswith("4") and code not in ("401", "403")
+    if code.startswith("PGRST"):
+        return code[5:6] in ("1", "2")  # Request/schema errors; PGRST3xx is auth
+    return code[:2] in ("22", "23")
+
+
+class ArticleWriter:
+    """
+    Streaming upserter for the 'articles' table.
+
+    Articles are buffered as they are produced and flushed when the buffer reaches
+    UPLOAD_CHUNK_ROWS rows, UPLOAD_CHUNK_BYTES of JSON, or UPLOAD_FLUSH_SECONDS of age.
+    A chunk Supabase rejects (bad row, oversized payload) is split in half and retried
+    until the bad rows are isolated, so one bad row no longer drops the whole batch.
+    Timeouts, connection errors and 5xx would fail the same way for every half: they
+    fail the chunk once, and later chunks fail fast without a request (the run journal
+    keeps them pending for the next attempt).
+    """
+
+    def __init__(self, client, on_uploaded: Optional[Callable[[List[str]], None]] = None,
+                 max_rows: int = UPLOAD_CHUNK_ROWS, max_bytes: int = UPLOAD_CHUNK_BYTES,
+                 max_age: float = UPLOAD_FLUSH_SECONDS, link_index: Optional[LinkIndex] = None):
+        self.client = client
+        self.link_index = link_index
+        self.on_uploaded = on_uploaded
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._buffer: Dict[str, Dict] = {}  # canonical link -> row (a later copy of a link replaces the earlier one)
+        self._buffer_bytes = 0
+        self._oldest: Optional[float] = None
+        self.uploaded: List[str] = []
+        self.failed: List[Dict] = []
+        self.unreachable = False  # Set by a transport/server error; later chunks skip the request
+        self.chunk_latencies: List[float] = []
+
+    @staticmethod
+    def clean(article: Dict) -> Dict:
+        """
+        Strips fields the 'articles' table doesn't have. Links keep the publisher's spelling
+        (the app opens them); canonical_link (-> link_key) is what dedup matches on.
+        """
+        row = {k: v for k, v in article.items() if k in ARTICLE_COLUMNS}
+        row['canonical_link'] = canonical_url(row['link'])
+        if row.get('related_links'):
+            # One spelling per story
+            by_canonical = {}
+            for l in row['related_links']:
+                by_canonical.setdefault(canonical_url(l), l)
+            row['related_links'] = list(by_canonical.values())
+        return row
+
+    def add(self, article: Dict):
+        row = self.clean(article)
+        self._buffer[row['canonical_link']] = row
+        self._buffer_bytes += len(json.dumps(row, default=str))
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        if (len(self._buffer) >= self.max_rows or self._buffer_bytes >= self.max_bytes
+                or time.monotonic() - self._oldest >= self.max_age):
+            self.flush()
+
+    def extend(self, articles: List[Dict]):
+        for article in articles:
+            self.add(article)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        rows = list(self._buffer.values())
+        self._buffer, self._buffer_bytes, self._oldest = {}, 0, None
+        self._upsert(rows)
+
+    def close(self) -> List[Dict]:
+        """Flushes what's left. Returns the rows that could not be written."""
+        self.flush()
+        if self.failed:
+            print(f"!!! {len(self.failed)} articles could not be uploaded: {[r['link'] for r in self.failed][:5]}")
+        return self.failed
+
+    def _upsert(self, rows: List[Dict]):
+        if self.unreachable:
+            self.failed.extend(rows)
+            return
+        start = time.perf_counter()
+        try:
+            # Upsert based on the canonical link_key, so another spelling of a stored link updates it
+            self.client.table("articles").upsert(rows, on_conflict="link_key").execute()
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            if not _is_row_error(e):
+                print(f"  Upsert of {len(rows)} rows failed ({elapsed * 1000:.0f} ms), Supabase unreachable: {e}")
+                metrics.incr("upload_transport_errors")
+                self.unreachable = True
+                self.failed.extend(rows)
+                return
+            if len(rows) == 1:
+                print(f"  Upsert failed for {rows[0]['link']} ({elapsed * 1000:.0f} ms): {e}")
+                metrics.incr("upload_failed_rows")
+                self.failed.extend(rows)
+                return
+            print(f"  Upsert of {len(rows)} rows failed ({elapsed * 1000:.0f} ms), bisecting: {e}")
+            metrics.incr("upload_retries")
+            mid = len(rows) // 2
+            self._upsert(rows[:mid])
+            self._upsert(rows[mid:])
+            return
+
+        elapsed = time.perf_counter() - start
+        self.chunk_latencies.append(elapsed)
+        metrics.incr("upload_chunks")
+        print(f"  Upserted {len(rows)} articles in {elapsed * 1000:.0f} ms")
+        links = [r['link'] for r in rows]
+        self.uploaded.extend(links)
+        if self.link_index:
+            self.link_index.add(links + [l for r in rows for l in (r.get('related_links') or [])])
+        if self.on_uploaded:
+            self.on_uploaded(links)
+
+
+def create_client(url: str, key: str):
+    """supabase.create_client, imported on first use (the SDK is slow to load; see bench_startup.py)."""
+    from supabase import create_client as _create_client
+    return _create_client(url, key)
+
 
 class DatabaseManager:
     def __init__(self):
@@ -17,8 +192,25 @@ class DatabaseManager:
             detected_val = f"'{key}'" if key else "EMPTY STRING"
             raise ValueError(f"CRITICAL: SUPABASE_KEY is {detected_val}! GitHub is not sending the secret. Check the name in GitHub Settings.")
 
-        print(f"Connecting to Supabase: {url[:25]}...")
-        self.client: Client = create_client(url, key)
+        self._url, self._key = url, key
+        self._client = None
+        self._client_lock = threading.Lock()
+        # Local seen-link index so most dedup checks skip the DB (see link_index.py)
+        self.link_index = LinkIndex() if os.getenv("LINK_INDEX_DISABLED", "").lower() not in ("1", "true", "yes") else None
+
+    @property
+    def client(self):
+        """Supabase client, connected on first use so runs answered locally never load the SDK."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    print(f"Connecting to Supabase: {self._url[:25]}...")
+                    self._client = create_client(self._url, self._key)
+        return self._client
+
+    def article_writer(self, on_uploaded: Optional[Callable[[List[str]], None]] = None) -> ArticleWriter:
+        """Streaming writer: add() articles as they are produced, close() at the end."""
+        return ArticleWriter(self.client, on_uploaded=on_uploaded, link_index=self.link_index)
 
     def upload_batch(self, articles: List[Dict]):
         """Uploads a batch of processed articles to 'articles' table."""
@@ -30,44 +222,97 @@ class DatabaseManager:
             return
         
         print(f"Uploading {len(articles)} articles to Supabase...")
-        try:
-            # Upsert based on 'link'
-            self.client.table("articles").upsert(articles, on_conflict="link").execute()
-            print("--- DATABASE UPLOAD SUCCESSFUL ---")
-        except Exception as e:
-            print(f"!!! DATABASE UPLOAD FAILED !!! Error: {e}")
-            raise e # Raise to fail the GitHub Action so we see it
+        writer = self.article_writer()
+        writer.extend(articles)
+        failed = writer.close()
+        if failed and not writer.uploaded:
+            # Nothing at all got through: that's an outage/config problem, not a bad row
+            print("!!! DATABASE UPLOAD FAILED !!!")
+            raise RuntimeError(f"Upload failed for all {len(failed)} articles") # Raise to fail the GitHub Action so we see it
+        print("--- DATABASE UPLOAD SUCCESSFUL ---")
 
-    def purge_old_data(self, hours=48):
-        """Deletes articles older than X hours."""
+    def purge_old_data(self, hours=48) -> Optional[Dict]:
+        """Deletes articles older than X hours (UTC), in batches. Returns the purge report."""
         if not self.client:
-            return
+            return None
         
-        limit_date = (datetime.datetime.now() - datetime.timedelta(hours=hours)).isoformat()
         print(f"Purging articles older than {hours} hours...")
+        archive = ArticleArchive(RETENTION_ARCHIVE_DIR) if RETENTION_ARCHIVE_DIR else None
+        report = purge_articles(self.client, hours=hours, archive=archive)
+        print(f"Purge complete: {report['rows']} rows in {len(report['batches'])} batches (cutoff {report['cutoff']}).")
+        return report
+
+    def get_latest_batch(self, limit=15, columns: str = "card") -> List[Dict]:
+        """Fetches the latest articles for the app (Testing purpose)."""
+        if not self.client:
+            return []
+        
         try:
-            self.client.table("articles").delete().lt("published", limit_date).execute()
-            print("Purge complete.")
+            response = self.client.table("articles").select(projection(columns)).order("published", desc=True).limit(limit).execute()
+            return response.data
         except Exception as e:
-            print(f"Purge error: {e}")
+            print(f"Fetch error: {e}")
+            return []
 
-    def get_latest_batch(self, limit=15) -> List[Dict]:
-        """Fetches the latest articles for the app (Testing purpose)."""
+    def get_top_articles(self, limit=5, columns: str = "reel") -> List[Dict]:
+        """Highest trust_score articles (manual reel generation)."""
         if not self.client:
             return []
         
         try:
-            response = self.client.table("articles").select("*").order("published", desc=True).limit(limit).execute()
+            response = self.client.table("articles").select(projection(columns)).order("trust_score", desc=True).limit(limit).execute()
             return response.data
         except Exception as e:
             print(f"Fetch error: {e}")
             return []
 
     def get_existing_links(self, links: List[str]) -> List[str]:
-        """Checks which links from the list already exist in the DB."""
-        if not self.client or not links:
+        """
+        Checks which links from the list already exist in the DB.
+        Answered from the local link index (rebuilt from Supabase when stale) when there is one.
+        """
+        if not links:
             return []
+        if not self.link_index:
+            return self._query_existing_links(links)
+        
+        if self.link_index.is_stale():
+            self.rebuild_link_index()
+            if not self.link_index:
+                return self._query_existing_links(links)
         
+        known = self.link_index.known(links)
+        metrics.incr("link_index_hits", len(known))
+        metrics.incr("link_index_misses", len(links) - len(known))
+        return [l for l in links if l in known]
+
+    def rebuild_link_index(self, hours: int = 48, page_size: int = 1000):
+        """Reloads the link index from every article in the retention window."""
+        cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        print("Rebuilding local link index from Supabase...")
+        try:
+            links, start = [], 0
+            while True:
+                response = self.client.table("articles").select("link,related_links")\
+                    .gte("published", cutoff)\
+                    .order("published", desc=True)\
+                    .range(start, start + page_size - 1)\
+                    .execute()
+                for record in response.data:
+                    links.append(record['link'])
+                    links.extend(record.get('related_links') or [])
+                if len(response.data) < page_size:
+                    break
+                start += page_size
+            self.link_index.rebuild(links)
+            print(f"Link index rebuilt with {len(links)} links.")
+        except Exception as e:
+            # Without a trustworthy index, fall back to asking the DB about everything
+            print(f"Link index rebuild failed: {e}")
+            self.link_index = None
+
+    def _query_existing_links(self, links: List[str]) -> List[str]:
+        """Asks Supabase which links exist, matching on the canonical link_key column."""
         try:
             # Chunking to avoid URL length issues or query limits if list is huge
             # (Though RSS batches are usually small ~50-100)
@@ -77,11 +322,24 @@ class DatabaseManager:
             chunk_size = 50
             for i in range(0, len(links), chunk_size):
                 chunk = links[i:i + chunk_size]
-                response = self.client.table("articles").select("link").in_("link", chunk).execute()
+                # Several raw spellings can share one key; all of them are "existing"
+                by_key, by_canonical = {}, {}
+                for l in chunk:
+                    by_key.setdefault(link_key(l), []).append(l)
+                    by_canonical.setdefault(canonical_url(l), []).append(l)
+                
+                response = self.client.table("articles").select("link_key").in_("link_key", list(by_key)).execute()
+                for record in response.data:
+                    existing_links.extend(by_key.get(record['link_key'], []))
+                
+                # Links merged into a synthesized story only live in its related_links (publisher spelling)
+                spellings = list(dict.fromkeys(chunk + list(by_canonical)))
+                response = self.client.table("articles").select("related_links").ov("related_links", spellings).execute()
                 for record in response.data:
-                    existing_links.append(record['link'])
+                    for l in (record.get('related_links') or []):
+                        existing_links.extend(by_canonical.get(canonical_url(l), []))
                     
-            return existing_links
+            return list(dict.fromkeys(existing_links))
             
         except Exception as e:
             print(f"Error checking existing links: {e}")
@@ -103,6 +361,87 @@ class DatabaseManager:
         except Exception as e:
             print(f"Failed to save Morning Reel: {e}")
 
+    def save_run_report(self, report: Dict):
+        """Stores a run report (see instrumentation.py) in 'pipeline_runs'."""
+        if not self.client: return
+        try:
+            self.client.table("pipeline_runs").upsert({
+                "run_id": report["run_id"],
+                "status": report["status"],
+                "started_at": report["started_at"],
+                "duration_seconds": report["duration_seconds"],
+                "report": report
+            }, on_conflict="run_id").execute()
+            print(f"Run report saved to pipeline_runs ({report['run_id']})")
+        except Exception as e:
+            print(f"Failed to save run report: {e}")
+
+    def get_reel_candidates(self, categories: List[str], per_category: int = 3) -> List[Dict]:
+        """
+        Feature 9: Best-of-latest story per category in ONE round trip.
+        Calls the `reel_candidates` SQL function (see schema.sql).
+        """
+        if not self.client or not categories: return []
+        try:
+            response = self.client.rpc("reel_candidates", {
+                "categories": categories,
+                "per_category": per_category
+            }).execute()
+            return response.data or []
+        except Exception as e:
+            print(f"Failed to fetch reel candidates: {e}")
+            return []
+
+    def get_training_rows(self, limit: int = 20000, page_size: int = 1000) -> List[Dict]:
+        """Analyzed articles with their labels, newest first (label_model.py --retrain)."""
+        if not self.client: return []
+        rows, start = [], 0
+        try:
+            while start < limit:
+                response = self.client.table("articles").select(projection("labels"))\
+                    .not_.is_("ai_summary", "null")\
+                    .order("published", desc=True)\
+                    .range(start, min(start + page_size, limit) - 1)\
+                    .execute()
+                rows.extend(response.data)
+                if len(response.data) < page_size:
+                    break
+                start += page_size
+        except Exception as e:
+            print(f"Failed to fetch training rows: {e}")
+        return rows
+
+    def get_feed_rows(self, hours: int = 48, page_size: int = 1000) -> List[Dict]:
+        """Every article in the retention window (app columns only), newest first."""
+        if not self.client: return []
+        cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(hours=hours)).strftime('%Y-%m-%dT%H:%M:%SZ')
+        # The app's detail sheet reads straight from these rows, so they carry every column
+        columns = projection("detail")
+        try:
+            rows, start = [], 0
+            while True:
+                response = self.client.table("articles").select(columns)\
+                    .gte("published", cutoff)\
+                    .order("published", desc=True)\
+                    .range(start, start + page_size - 1)\
+                    .execute()
+                rows.extend(response.data)
+                if len(response.data) < page_size:
+                    break
+                start += page_size
+            return rows
+        except Exception as e:
+            print(f"Failed to fetch feed rows: {e}")
+            return []
+
+    def upload_static(self, bucket: str, path: str, body: bytes, content_type: str, cache_seconds: int = 300):
+        """Uploads (overwrites) a static object in Supabase Storage."""
+        self.client.storage.from_(bucket).upload(path, body, {
+            "content-type": content_type,
+            "cache-control": str(cache_seconds),
+            "upsert": "true"
+        })
+
     def get_all_watchlists(self) -> List[Dict]:
         """Feature 10: Fetch all user watchlists for processing."""
         if not self.client: return []
@@ -0,0 +1,84 @@
+"""
+Conditional GET cache for RSS sources.
+
+Stores the ETag / Last-Modified validators and a hash of the start of the last
+body seen for every feed URL, so an unchanged feed costs a 304, or, when the
+publisher ignores the conditional headers, one FEED_HASH_BYTES read and no
+parse at all.
+
+Feeds list their newest entries first, so the leading FEED_HASH_BYTES (the
+channel header plus the first few items) change whenever a new entry is
+published; an edit further down only touches entries we took on an earlier
+run. Bodies shorter than that are compared whole. The hash is only kept when
+the last parse read every fresh entry; one stopped by the entry limit has to
+look at the same head again.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from local_state import state_path
+
+FEED_HASH_BYTES = int(os.getenv("FEED_HASH_BYTES", "16384"))
+
+
+def prefix_hash(head: bytes) -> str:
+    """The content hash stored for a body that starts with `head`."""
+    return hashlib.sha256(head[:FEED_HASH_BYTES]).hexdigest()
+
+
+class FeedCache:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or state_path("feed_cache.sqlite3")
+        # Feeds are fetched from a thread pool, so share one connection behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            create table if not exists feed_validators (
+                url text primary key,
+                etag text,
+                last_modified text,
+                content_hash text,
+                updated_at real
+            )
+        """)
+        self._conn.commit()
+
+    def _get(self, url: str) -> Optional[tuple]:
+        with self._lock:
+            return self._conn.execute(
+                "select etag, last_modified, content_hash from feed_validators where url = ?", (url,)
+            ).fetchone()
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Headers to send so the publisher can answer 304 Not Modified."""
+        row = self._get(url)
+        headers = {}
+        if row:
+            etag, last_modified, _ = row
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def is_unchanged(self, url: str, content_hash: str, etag: Optional[str] = None) -> bool:
+        """
+        True if the body starts like the last one we parsed (see prefix_hash), or the
+        publisher answered 200 with the ETag we already sent it.
+        """
+        row = self._get(url)
+        return bool(row and ((row[2] and row[2] == content_hash) or (etag and row[0] == etag)))
+
+    def store(self, url: str, etag: Optional[str], last_modified: Optional[str], content_hash: Optional[str]):
+        with self._lock:
+            self._conn.execute(
+                "insert or replace into feed_validators (url, etag, last_modified, content_hash, updated_at) "
+                "values (?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_hash, time.time())
+            )
+            self._conn.commit()
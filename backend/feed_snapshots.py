@@ -0,0 +1,152 @@
+"""
+Precomputed feed snapshots for the app.
+
+After the upload step the pipeline renders the current 48h window into static,
+gzip-compressed JSON pages (one set per category plus "all"), so app opens can
+be plain cacheable GETs instead of a live `articles` query per page:
+
+    feed/index.json                      manifest: every page's path, etag and count
+    feed/<feed>/page-<n>.json.gz         {"feed", "page", "articles": [...]}
+    feed/since.json.gz                   articles added / ids removed since the previous publish
+
+Pages hold no timestamps, so an unchanged page keeps its bytes and etag and is
+not re-uploaded. Output goes to FEED_SNAPSHOT_DIR and/or the Supabase Storage
+bucket FEED_SNAPSHOT_BUCKET; with neither set the stage is skipped.
+"""
+
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from instrumentation import metrics
+from local_state import state_path
+
+FEED_SNAPSHOT_DIR = os.getenv("FEED_SNAPSHOT_DIR")
+FEED_SNAPSHOT_BUCKET = os.getenv("FEED_SNAPSHOT_BUCKET")
+# Matches PAGE_SIZE in the app's DataRepository
+FEED_PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", "20"))
+FEED_MAX_PAGES = int(os.getenv("FEED_MAX_PAGES", "10"))
+
+SNAPSHOTS_ENABLED = bool(FEED_SNAPSHOT_DIR or FEED_SNAPSHOT_BUCKET)
+SNAPSHOT_VERSION = 1
+
+
+def feed_slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "feed"
+
+
+def _encode(payload: Dict) -> Tuple[bytes, str]:
+    """Deterministic gzip JSON body and its etag (hash of the uncompressed JSON)."""
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    etag = hashlib.sha256(raw).hexdigest()[:16]
+    # mtime=0 keeps the gzip header stable so identical pages are byte-identical
+    return gzip.compress(raw, compresslevel=9, mtime=0), etag
+
+
+def build_snapshots(rows: List[Dict], categories: List[str], page_size: int = FEED_PAGE_SIZE,
+                    max_pages: int = FEED_MAX_PAGES) -> Tuple[Dict[str, bytes], Dict]:
+    """
+    Renders pages for "all" and every category from `rows` (newest first).
+    Returns ({path: gzip body}, manifest feeds section).
+    """
+    rows = sorted(rows, key=lambda r: r.get("published") or "", reverse=True)
+    feeds = {"all": rows}
+    for category in categories:
+        feeds[category] = [r for r in rows if r.get("category") == category]
+
+    files, manifest = {}, {}
+    for name, items in feeds.items():
+        slug = feed_slug(name)
+        pages = []
+        for n in range(min(max_pages, max(1, -(-len(items) // page_size)))):
+            chunk = items[n * page_size:(n + 1) * page_size]
+            body, etag = _encode({"feed": name, "page": n, "articles": chunk})
+            path = f"feed/{slug}/page-{n}.json.gz"
+            files[path] = body
+            pages.append({"path": path, "etag": etag, "count": len(chunk)})
+        manifest[name] = {"count": min(len(items), max_pages * page_size), "pages": pages}
+    return files, manifest
+
+
+class SnapshotPublisher:
+    def __init__(self, db=None, directory: Optional[str] = FEED_SNAPSHOT_DIR,
+                 bucket: Optional[str] = FEED_SNAPSHOT_BUCKET, state_file: Optional[str] = None):
+        self.db = db
+        self.directory = directory
+        self.bucket = bucket
+        self.state_file = state_file or state_path("feed_snapshot_state.json")
+
+    def _load_state(self) -> Dict:
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: Dict):
+        with open(self.state_file, "w") as f:
+            json.dump(state, f)
+
+    def _write(self, path: str, body: bytes, content_type: str, cache_seconds: int):
+        if self.directory:
+            target = os.path.join(self.directory, path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as f:
+                f.write(body)
+        if self.bucket and self.db:
+            self.db.upload_static(self.bucket, path, body, content_type, cache_seconds)
+        metrics.incr("snapshot_bytes", len(body))
+
+    def publish(self, rows: List[Dict], categories: List[str]) -> Dict:
+        """Writes changed pages, the since-delta and the manifest. Returns the manifest."""
+        now = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        previous = self._load_state()
+        known_etags = previous.get("etags", {})
+
+        files, feeds = build_snapshots(rows, categories)
+        etags = {page["path"]: page["etag"] for feed in feeds.values() for page in feed["pages"]}
+        changed = [path for path in files if known_etags.get(path) != etags[path]]
+        for path in changed:
+            self._write(path, files[path], "application/gzip", cache_seconds=300)
+        metrics.incr("snapshot_pages_written", len(changed))
+
+        # Delta against the ids the previous publish contained
+        previous_ids = set(previous.get("ids", []))
+        current_ids = [r.get("id") for r in rows if r.get("id")]
+        delta = {
+            "since": previous.get("generated_at"),
+            "generated_at": now,
+            "added": [r for r in rows if r.get("id") and r["id"] not in previous_ids],
+            "removed": sorted(previous_ids - set(current_ids)),
+        }
+        delta_body, delta_etag = _encode(delta)
+        self._write("feed/since.json.gz", delta_body, "application/gzip", cache_seconds=60)
+
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "generated_at": now,
+            "page_size": FEED_PAGE_SIZE,
+            "feeds": feeds,
+            "delta": {"path": "feed/since.json.gz", "etag": delta_etag, "since": delta["since"],
+                      "added": len(delta["added"]), "removed": len(delta["removed"])},
+        }
+        # The manifest is tiny and always changes; clients revalidate it first
+        self._write("feed/index.json", json.dumps(manifest, indent=1).encode("utf-8"), "application/json", cache_seconds=30)
+
+        self._save_state({"generated_at": now, "etags": etags, "ids": current_ids})
+        print(f"Feed snapshots: {len(files)} pages ({len(changed)} changed), "
+              f"delta +{len(delta['added'])}/-{len(delta['removed'])}.")
+        return manifest
+
+
+def publish_feed_snapshots(db, categories: List[str], hours: int = 48) -> Optional[Dict]:
+    """Publish stage: reads the retention window once and renders every feed from it."""
+    rows = db.get_feed_rows(hours=hours)
+    if not rows:
+        print("SKIP: No rows to publish.")
+        return None
+    return SnapshotPublisher(db).publish(rows, categories)
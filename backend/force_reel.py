@@ -3,6 +3,7 @@ import datetime
 import json
 from dotenv import load_dotenv
 from database_manager import DatabaseManager
+from reel_builder import story_ref
 
 if os.path.exists("backend/.env"):
     load_dotenv("backend/.env")
@@ -15,15 +16,14 @@ def force_reel():
     
     # 1. Fetch Top 3 Articles (High Trust)
     # We select articles published in the last 24h preferably, but just top 3 latest High Score is good.
-    res = db.client.table("articles").select("*").order("trust_score", desc=True).limit(5).execute()
-    articles = res.data
+    articles = db.get_top_articles(limit=5)
     
     if not articles:
         print("CRITICAL: No articles in DB to make a reel!")
         return
 
     # Filter for quality
-    top_3 = articles[:3]
+    top_3 = [story_ref(a) for a in articles[:3]]
     
     # 2. Construct Reel Content with NEW Title
     today_str_pretty = datetime.datetime.now().strftime('%b %d')
@@ -0,0 +1,260 @@
+"""
+Shared HTTP transport for the backend (RSS feeds, NewsData.io).
+
+One client per process, so every fetch reuses pooled keep-alive connections
+instead of a new TCP+TLS handshake per feed:
+- HTTP/2 (httpx + h2) when both are installed and HTTP_HTTP2 isn't "0",
+  otherwise a requests.Session with a per-host connection pool
+- bounded retries with exponential backoff + jitter on timeouts, connection
+  errors and 429/5xx (Retry-After is honored, capped)
+- bodies are streamed (stream() hands the chunks to the caller, get() reads
+  them all) and cut off at HTTP_MAX_RESPONSE_BYTES
+- per-host stats: requests, retries, errors, bytes, seconds
+
+Usage:
+    from http_client import shared_client
+    response = shared_client().get(url, headers=headers, timeout=15)
+
+    with shared_client().stream(url) as response:
+        for chunk in response.iter_chunks():
+            ...
+"""
+
+import contextlib
+import importlib.util
+import json
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+from instrumentation import metrics
+
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "15"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+HTTP_BACKOFF_SECONDS = float(os.getenv("HTTP_BACKOFF_SECONDS", "0.5"))
+HTTP_MAX_RESPONSE_BYTES = int(os.getenv("HTTP_MAX_RESPONSE_BYTES", str(5 * 1024 * 1024)))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "4"))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "1").lower() not in ("0", "false", "no")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_RETRY_AFTER_SECONDS = 10
+
+_STREAM_CHUNK = 64 * 1024
+
+
+def http2_available() -> bool:
+    return importlib.util.find_spec("httpx") is not None and importlib.util.find_spec("h2") is not None
+
+
+class ResponseTooLarge(Exception):
+    pass
+
+
+class HttpResponse:
+    """
+    The parts of a response the backend reads (same names as requests.Response).
+    The body is streamed by iter_chunks() or read whole (capped) through `content`.
+    """
+
+    def __init__(self, url: str, status_code: int, headers, chunks: Iterator[bytes] = iter(()),
+                 closer: Callable[[], None] = lambda: None, max_bytes: int = HTTP_MAX_RESPONSE_BYTES):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.bytes_read = 0
+        self._chunks = chunks
+        self._closer = closer
+        self._max_bytes = max_bytes
+        self._content: Optional[bytes] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        for chunk in self._chunks:
+            self.bytes_read += len(chunk)
+            if self.bytes_read > self._max_bytes:
+                raise ResponseTooLarge(f"response exceeds {self._max_bytes} bytes")
+            yield chunk
+
+    @property
+    def content(self) -> bytes:
+        if self._content is None:
+            self._content = b"".join(self.iter_chunks())
+        return self._content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        """Releases the connection; an unread body means it is dropped rather than reused."""
+        self._closer()
+
+
+class HttpClient:
+    def __init__(self, http2: bool = HTTP_HTTP2, pool_per_host: int = HTTP_POOL_PER_HOST,
+                 max_retries: int = HTTP_MAX_RETRIES, backoff: float = HTTP_BACKOFF_SECONDS,
+                 max_bytes: int = HTTP_MAX_RESPONSE_BYTES):
+        self.http2 = http2 and http2_available()
+        self.pool_per_host = pool_per_host
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._transport = None
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    # --- Transport (created on first request) ---
+
+    def _get_transport(self):
+        with self._lock:
+            if self._transport is None:
+                if self.http2:
+                    import httpx
+                    self._transport = httpx.Client(
+                        http2=True,
+                        follow_redirects=True,
+                        limits=httpx.Limits(max_connections=None, max_keepalive_connections=self.pool_per_host * 16),
+                    )
+                else:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    # Retries are done in stream() so both transports behave the same
+                    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=self.pool_per_host, max_retries=0)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._transport = session
+            return self._transport
+
+    def _open(self, url: str, headers: Dict, timeout: float, max_bytes: int) -> HttpResponse:
+        """Sends the request and returns once the headers are in; the body is not read yet."""
+        transport = self._get_transport()
+        if self.http2:
+            r = transport.send(transport.build_request("GET", url, headers=headers, timeout=timeout), stream=True)
+            response = HttpResponse(str(r.url), r.status_code, r.headers, r.iter_bytes(_STREAM_CHUNK), r.close, max_bytes)
+        else:
+            r = transport.get(url, headers=headers, timeout=timeout, stream=True)
+            response = HttpResponse(getattr(r, "url", url), r.status_code, r.headers, r.iter_content(_STREAM_CHUNK),
+                                    r.close, max_bytes)
+        if int(response.headers.get("Content-Length") or 0) > max_bytes:
+            response.close()
+            raise ResponseTooLarge(f"Content-Length {response.headers['Content-Length']} exceeds {max_bytes} bytes")
+        return response
+
+    # --- Public API ---
+
+    @contextlib.contextmanager
+    def stream(self, url: str, headers: Optional[Dict] = None, timeout: float = HTTP_TIMEOUT_SECONDS,
+               max_retries: Optional[int] = None, max_bytes: Optional[int] = None):
+        """
+        Opens a GET with retries and yields the response before its body is read.
+        Leaving the block early (e.g. a parser that has enough entries) closes the connection.
+        After the last retry the last response is yielded, even a 5xx; network errors and
+        ResponseTooLarge are raised.
+        """
+        host = urlparse(url).netloc.lower()
+        retries = self.max_retries if max_retries is None else max_retries
+        max_bytes = max_bytes or self.max_bytes
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                response = self._open(url, headers or {}, timeout, max_bytes)
+            except ResponseTooLarge:
+                self._record(host, time.perf_counter() - start, error=True)
+                raise
+            except Exception as e:
+                self._record(host, time.perf_counter() - start, error=True)
+                if attempt >= retries or not self._is_transient(e):
+                    raise
+                delay = self._delay(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                    break
+                response.close()
+                self._record(host, time.perf_counter() - start)
+                delay = self._delay(attempt, response.headers.get("Retry-After"))
+
+            attempt += 1
+            self._record_retry(host)
+            print(f"  HTTP retry {attempt}/{retries} for {host} in {delay:.1f}s")
+            time.sleep(delay)
+
+        error = False
+        try:
+            yield response
+        except Exception:
+            error = True
+            raise
+        finally:
+            response.close()
+            self._record(host, time.perf_counter() - start, nbytes=response.bytes_read, error=error)
+
+    def get(self, url: str, headers: Optional[Dict] = None, timeout: float = HTTP_TIMEOUT_SECONDS,
+            max_retries: Optional[int] = None, max_bytes: Optional[int] = None) -> HttpResponse:
+        """GET with retries; the whole body (capped) is read into `content`."""
+        with self.stream(url, headers, timeout, max_retries, max_bytes) as response:
+            response.content
+        return response
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        """Timeouts and connection failures are worth retrying; bad URLs etc. are not."""
+        name = type(error).__name__
+        return any(k in name for k in ("Timeout", "Connect", "RemoteProtocol", "ChunkedEncoding", "ReadError"))
+
+    def _delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after and retry_after.strip().isdigit():
+            return min(float(retry_after), MAX_RETRY_AFTER_SECONDS)
+        return self.backoff * (2 ** attempt) * random.uniform(0.8, 1.2)
+
+    def _record(self, host: str, seconds: float, nbytes: int = 0, error: bool = False):
+        with self._lock:
+            entry = self._stats.setdefault(host, {"requests": 0, "retries": 0, "errors": 0, "bytes": 0, "seconds": 0.0})
+            entry["requests"] += 1
+            entry["errors"] += int(error)
+            entry["bytes"] += nbytes
+            entry["seconds"] += seconds
+        metrics.incr("http_calls")
+        metrics.incr("bytes_fetched", nbytes)
+
+    def _record_retry(self, host: str):
+        with self._lock:
+            self._stats[host]["retries"] += 1
+        metrics.incr("http_retries")
+
+    def host_stats(self, reset: bool = False) -> Dict[str, Dict[str, float]]:
+        """Per-host totals since the last reset, slowest host first."""
+        with self._lock:
+            stats = {h: dict(v, seconds=round(v["seconds"], 3)) for h, v in self._stats.items()}
+            if reset:
+                self._stats = {}
+        return dict(sorted(stats.items(), key=lambda kv: kv[1]["seconds"], reverse=True))
+
+    def close(self):
+        with self._lock:
+            if self._transport is not None:
+                self._transport.close()
+                self._transport = None
+
+
+_shared: Optional[HttpClient] = None
+_shared_lock = threading.Lock()
+
+
+def shared_client() -> HttpClient:
+    """The process-wide client (its pools stay warm across runs in --daemon mode)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HttpClient()
+        return _shared
@@ -1,11 +1,31 @@
-import feedparser
 import datetime
 import json
 import os
-from typing import List, Dict
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+from typing import Dict, List, Optional, Tuple
+from feed_cache import FEED_HASH_BYTES, FeedCache, prefix_hash
+from feed_stream import FeedFormatError, feedparser_entries, fresh_entries
+from http_client import HttpClient, shared_client
+from instrumentation import metrics
+from label_model import shared_model
+from source_health import SourceScheduler
+
+# Concurrent fetch tuning (overridable from the workflow env)
+FETCH_MAX_WORKERS = int(os.getenv("INGEST_MAX_WORKERS", "8"))
+FETCH_PER_HOST_LIMIT = int(os.getenv("INGEST_PER_HOST_LIMIT", "2"))
+FETCH_DEADLINE_SECONDS = float(os.getenv("INGEST_DEADLINE_SECONDS", "30"))
 
 class IngestionEngine:
-    def __init__(self):
+    def __init__(self, use_feed_cache: bool = True, http: HttpClient = None, scheduler: SourceScheduler = None):
+        # Pooled keep-alive connections with retries, shared by every fetch (see http_client.py)
+        self.http = http or shared_client()
+        # Conditional GET validators persisted between runs (see feed_cache.py)
+        self.feed_cache = FeedCache() if use_feed_cache else None
+        # Per-source latency/yield/duplicate history: which feeds to poll and how deep (see source_health.py)
+        self.scheduler = scheduler or SourceScheduler()
         self.sources = {
             "friendly_sources": [
                 # --- AGGREGATORS ---
@@ -38,58 +58,121 @@ class IngestionEngine:
             ]
         }
 
-    def fetch_rss_feed(self, url: str, category: str, source_name: str = "Unknown") -> List[Dict]:
-        """Fetches and normalizes RSS feed data using robust requests."""
-        from dateutil import parser 
-        import requests # Using requests for better header control
-        
+    def categories(self) -> List[str]:
+        """Every category the friendly sources cover, in first-seen order."""
+        return list(dict.fromkeys(s["category"] for s in self.sources["friendly_sources"]))
+
+    def fetch_rss_feed(self, url: str, category: str, source_name: str = "Unknown", limit: int = None) -> List[Dict]:
+        """
+        Fetches and normalizes RSS feed data, reading only as much of the body as it needs.
+        Takes up to `limit` fresh entries (default: what the scheduler learned for this feed).
+        """
+        articles, validators = self._fetch_feed(url, category, source_name, limit)
+        self._store_validators(url, validators)
+        return articles
+
+    def _store_validators(self, url: str, validators: Optional[Dict]):
+        """Remembers the feed's ETag/Last-Modified/prefix hash; only for results that were kept."""
+        if self.feed_cache and validators:
+            self.feed_cache.store(url, **validators)
+
+    def _fetch_feed(self, url: str, category: str, source_name: str = "Unknown",
+                    limit: int = None) -> Tuple[List[Dict], Optional[Dict]]:
+        """
+        fetch_rss_feed without touching the feed cache: (articles, validators to store).
+        Storing is left to the caller so a result thrown away (fetch deadline) can't mark
+        the feed as handled.
+        """
         print(f"Fetching RSS: {url} ({source_name})...")
+        limit = limit or self.scheduler.entry_limit(url)
+        started = time.monotonic()
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
         
+        if self.feed_cache:
+            headers.update(self.feed_cache.conditional_headers(url))
+        
         try:
-            response = requests.get(url, headers=headers, timeout=15)
-            feed = feedparser.parse(response.content)
-            articles = []
-            
-            for entry in feed.entries[:7]:
-                raw_date = entry.get("published") or entry.get("updated") or str(datetime.datetime.now())
+            with self.http.stream(url, headers=headers, timeout=15) as response:
+                # 304: Publisher confirms nothing changed since our last fetch
+                if response.status_code == 304:
+                    print("  Not modified (304), no new entries.")
+                    metrics.incr("feed_cache_hits")
+                    self.scheduler.health.record_fetch(url, time.monotonic() - started)
+                    return [], None
+                
+                # http_client hands back the last response once retries run out, 5xx included
+                if not response.ok:
+                    print(f"  HTTP {response.status_code} from {url}, no entries.")
+                    metrics.incr("http_errors")
+                    self.scheduler.health.record_fetch(url, time.monotonic() - started,
+                                                       error=f"HTTP {response.status_code}")
+                    return [], None
+                
+                # Compare the leading bytes before parsing: same start -> the same newest entries, already handled
+                stream = response.iter_chunks()
+                head = b""
+                for chunk in stream:
+                    head += chunk
+                    if len(head) >= FEED_HASH_BYTES:
+                        break
+                content_hash = prefix_hash(head)
+                if self.feed_cache and self.feed_cache.is_unchanged(
+                        url, content_hash, etag=response.headers.get("ETag")):
+                    print("  Newest entries unchanged since last run.")
+                    metrics.incr("feed_cache_hits")
+                    self.scheduler.health.record_fetch(url, time.monotonic() - started)
+                    return [], None
+                
+                # Everything read is kept for the feedparser fallback
+                read = []
+                def chunks():
+                    if head:
+                        read.append(head)
+                        yield head
+                    for chunk in stream:
+                        read.append(chunk)
+                        yield chunk
+                
                 try:
-                    dt = parser.parse(raw_date)
-                    if not dt.tzinfo:
-                        dt = dt.replace(tzinfo=datetime.timezone.utc)
-                    
-                    # Filter: Skip articles older than 24 hours
-                    now = datetime.datetime.now(datetime.timezone.utc)
-                    if (now - dt).total_seconds() > 86400: # 24 hours
-                        continue
-
-                    iso_date = dt.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
-                except:
-                    # If date parsing fails, default to NOW (fresh) or skip?
-                    # Let's default to now but maybe mark it? 
-                    # Simplicity: just use now.
-                    iso_date = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
-
-                # Handle various summary fields
-                summary_text = entry.get("summary") or entry.get("description") or ""
-
+                    entries = fresh_entries(chunks(), limit=limit)
+                    metrics.incr("feeds_streamed")
+                except FeedFormatError as e:
+                    print(f"  Streaming parse failed ({e}), falling back to feedparser.")
+                    metrics.incr("feed_parse_fallbacks")
+                    body = b"".join(read) + b"".join(stream)
+                    entries = feedparser_entries(body, limit=limit)
+            
+            validators = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                # A parse cut short by the entry limit left entries unread: the same head next
+                # time must be parsed again, so only a parse that reached a stale entry or the
+                # end of the feed marks the head as handled
+                "content_hash": content_hash if len(entries) < limit else None,
+            }
+            
+            articles = []
+            for entry in entries:
                 articles.append({
-                    "title": entry.title,
-                    "link": entry.link,
-                    "published": iso_date,
-                    "summary": summary_text,
+                    "title": entry["title"],
+                    "link": entry["link"],
+                    "published": entry["published"].strftime('%Y-%m-%dT%H:%M:%SZ'),
+                    "summary": entry["summary"],
                     "source": source_name, # Use the explicitly passed source name
                     "category": category,
                     "tier": 2,
                     "trust_badge": "Verified" # Friendly sources are generally verified
                 })
             print(f"  Success: Found {len(articles)} entries.")
-            return articles
+            self.scheduler.health.record_fetch(url, time.monotonic() - started, fresh=len(articles))
+            return articles, validators
         except Exception as e:
             print(f"  Error fetching {url}: {e}")
-            return []
+            metrics.incr("http_errors")
+            self.scheduler.health.record_fetch(url, time.monotonic() - started, error=f"{type(e).__name__}: {e}"[:200])
+            return [], None
 
     def fetch_newsdata(self) -> List[Dict]:
         """Tier 1: High Quality API (NewsData.io)."""
@@ -102,10 +185,11 @@ class IngestionEngine:
         print(f"Fetching NewsData.io...")
         
         try:
-            import requests # Lazy import
-            response = requests.get(url)
+            response = self.http.get(url, timeout=20)
             data = response.json()
             articles = []
+            # NewsData has no category we use; the local label model (if trained) guesses one
+            labels = shared_model()
             
             for entry in data.get('results', []):
                 articles.append({
@@ -117,30 +201,92 @@ class IngestionEngine:
                     "category": "AI & Frontiers", # Simplified mapping
                     "tier": 1,
                     "trust_badge": "Official", # Assume high trust for Tier 1
-                    "icon": "shield"
+                    "icon": "shield",
+                    "label_source": "newsdata"
                 })
+                if labels:
+                    articles[-1]["category"] = labels.category(articles[-1], default=articles[-1]["category"])
             return articles
         except Exception as e:
             print(f"NewsData Fetch Error: {e}")
             return []
 
-    def run_friendly_ingestion(self) -> List[Dict]:
-        """Runs ingestion across multiple friendly RSS sources."""
-        import random
+    def fetch_feeds_concurrently(self, sources: List[Dict], max_workers: int = FETCH_MAX_WORKERS,
+                                 per_host_limit: int = FETCH_PER_HOST_LIMIT,
+                                 deadline: float = FETCH_DEADLINE_SECONDS) -> List[List[Dict]]:
+        """
+        Fetches many feeds on a bounded thread pool.
+        - At most `per_host_limit` requests hit the same host at once (BBC hosts 5 feeds).
+        - Feeds still running after `deadline` seconds are dropped from this run.
+        - Results come back in the same order as `sources`, regardless of finish order.
+        - Feed cache validators are stored only for feeds whose results are returned; a
+          straggler finishing after the deadline would otherwise mark its dropped entries as seen.
+        """
+        if not sources:
+            return []
+
+        host_locks = {}
+        for source in sources:
+            host = urlparse(source["url"]).netloc.lower()
+            if host not in host_locks:
+                host_locks[host] = threading.BoundedSemaphore(max(1, per_host_limit))
+
+        started = time.monotonic()
+
+        def fetch_one(source: Dict) -> Tuple[List[Dict], Optional[Dict]]:
+            lock = host_locks[urlparse(source["url"]).netloc.lower()]
+            with lock:
+                # Don't start a request we already know can't finish in time
+                if time.monotonic() - started >= deadline:
+                    print(f"  Deadline reached, skipping {source.get('source')}")
+                    return [], None
+                return self._fetch_feed(source["url"], source["category"], source_name=source.get("source"))
+
+        results: List[List[Dict]] = [[] for _ in sources]
+        pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(sources))))
+        try:
+            futures = {pool.submit(fetch_one, source): i for i, source in enumerate(sources)}
+            done, pending = wait(futures, timeout=deadline)
+
+            for future in done:
+                try:
+                    articles, validators = future.result()
+                    self._store_validators(sources[futures[future]]["url"], validators)
+                    results[futures[future]] = articles
+                except Exception as e:
+                    print(f"  Error fetching {sources[futures[future]]['url']}: {e}")
+
+            for future in pending:
+                future.cancel()
+                print(f"  Timed out after {deadline:.0f}s: {sources[futures[future]].get('source')}")
+        finally:
+            # Don't block on stragglers; their sockets close on their own timeout
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        print(f"  Fetched {len(sources)} feeds in {time.monotonic() - started:.1f}s")
+        return results
+
+    def run_friendly_ingestion(self, concurrent: bool = True, budget: int = None) -> List[Dict]:
+        """Runs ingestion across the friendly RSS sources the scheduler picks for this run."""
         all_articles = []
+        sources = self.sources["friendly_sources"]
         
-        # Shuffle sources to ensure category diversity in every run
-        sources = self.sources["friendly_sources"].copy()
-        
-        # Pick 10 random sources to fetch per run (better coverage)
-        selected_sources = random.sample(sources, min(len(sources), 10)) 
+        # Every category gets its healthiest feed; the rest of the budget goes where new articles show up
+        selected_sources = self.scheduler.plan(sources, budget=budget)
+        metrics.incr("sources_polled", len(selected_sources))
+        metrics.incr("sources_skipped", len(sources) - len(selected_sources))
         
-        print(f"--- Fetching from {len(selected_sources)} Sources ---")
+        print(f"--- Fetching from {len(selected_sources)} of {len(sources)} Sources ---")
         
-        for source in selected_sources:
-            # Pass source name explicitly to helper
-            all_articles.extend(self.fetch_rss_feed(source["url"], source["category"], source_name=source.get("source")))
+        if concurrent:
+            for feed_articles in self.fetch_feeds_concurrently(selected_sources):
+                all_articles.extend(feed_articles)
+        else:
+            for source in selected_sources:
+                # Pass source name explicitly to helper
+                all_articles.extend(self.fetch_rss_feed(source["url"], source["category"], source_name=source.get("source")))
         
+        metrics.attach("source_health", self.scheduler.summary(sources))
         print(f"Collected {len(all_articles)} raw articles.")
         return all_articles
 
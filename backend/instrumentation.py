@@ -0,0 +1,123 @@
+"""
+Lightweight run instrumentation: per-stage timers and counters.
+
+Usage:
+    from instrumentation import metrics
+
+    with metrics.span("ingestion"):
+        ...
+    metrics.incr("http_calls")
+
+At the end of a run `main.py` writes the structured JSON report to
+`RUN_REPORT_PATH` (default: <BRIEF_CACHE_DIR>/run_reports/<run_id>.json) and,
+when `REPORT_TO_DB` is set, inserts it into the `pipeline_runs` table. Default
+reports older than RUN_REPORT_RETENTION_HOURS are deleted (the cache dir is
+saved between Actions runs, so they would pile up).
+"""
+
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from local_state import state_path
+
+RUN_REPORT_PATH = os.getenv("RUN_REPORT_PATH")
+REPORT_TO_DB = os.getenv("REPORT_TO_DB", "").lower() in ("1", "true", "yes")
+RUN_REPORT_RETENTION_HOURS = float(os.getenv("RUN_REPORT_RETENTION_HOURS", "72"))
+
+
+def _prune_reports(directory: str, keep: str):
+    """Deletes run reports in `directory` older than RUN_REPORT_RETENTION_HOURS (never `keep`)."""
+    cutoff = time.time() - RUN_REPORT_RETENTION_HOURS * 3600
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".json") and path != keep and os.path.getmtime(path) < cutoff:
+            os.remove(path)
+
+
+class RunMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._finish_hooks: List[Callable[[Dict], None]] = []
+        self.reset()
+
+    def reset(self, run_id: Optional[str] = None):
+        with self._lock:
+            self.run_id = run_id or os.getenv("GITHUB_RUN_ID") or uuid.uuid4().hex[:12]
+            self.started_at = datetime.datetime.now(datetime.timezone.utc)
+            self._started = time.perf_counter()
+            self.stages: Dict[str, Dict[str, float]] = {}
+            self.counters: Dict[str, int] = {}
+            self.details: Dict[str, Any] = {}
+            self._finish_hooks = []
+            self.last_report: Optional[Dict] = None
+
+    @contextlib.contextmanager
+    def span(self, stage: str):
+        """Times a pipeline stage; repeated spans with the same name accumulate."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                entry = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0})
+                entry["seconds"] += elapsed
+                entry["calls"] += 1
+
+    def incr(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def attach(self, name: str, value: Any):
+        """Adds a structured section (e.g. per-host HTTP stats) to the report."""
+        with self._lock:
+            self.details[name] = value
+
+    def on_finish(self, hook: Callable[[Dict], None]):
+        """Registers a callback that receives the final report (e.g. a DB writer)."""
+        self._finish_hooks.append(hook)
+
+    def report(self, status: str) -> Dict:
+        with self._lock:
+            return {
+                "run_id": self.run_id,
+                "status": status,
+                "started_at": self.started_at.strftime('%Y-%m-%dT%H:%M:%SZ'),
+                "duration_seconds": round(time.perf_counter() - self._started, 3),
+                "stages": {k: {"seconds": round(v["seconds"], 3), "calls": v["calls"]} for k, v in self.stages.items()},
+                "counters": dict(sorted(self.counters.items())),
+                **self.details,
+            }
+
+    def finish(self, status: str) -> Dict:
+        """Builds the report, writes it to disk and runs the finish hooks."""
+        report = self.report(status)
+        self.last_report = report
+
+        path = RUN_REPORT_PATH or state_path(os.path.join("run_reports", f"{self.run_id}.json"))
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Run report written to {path}")
+            if not RUN_REPORT_PATH:
+                _prune_reports(os.path.dirname(path), keep=path)
+        except Exception as e:
+            print(f"Failed to write run report: {e}")
+
+        for hook in self._finish_hooks:
+            try:
+                hook(report)
+            except Exception as e:
+                print(f"Run report hook failed: {e}")
+        return report
+
+
+# Process-wide instance shared by every module
+metrics = RunMetrics()
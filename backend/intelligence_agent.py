@@ -1,18 +1,221 @@
-import google.generativeai as genai
 import os
 import json
-from typing import Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from rate_limiter import RateLimiter, TokenUsage, estimate_tokens
+from llm_cache import LLMCache, content_key
+from instrumentation import metrics
+from label_model import shared_model
+from llm_schema import (ANALYSIS_FIELDS, LABEL_FIELDS, SCORE_FIELDS, SUMMARY_FIELDS, SYNTHESIS_FIELDS,
+                        extract_json, parse_json, response_schema, validate)
+
+# Number of generate_content calls allowed in flight at once
+GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "4"))
+# Articles packed into one prompt by analyze_batch (1 = one request per article)
+GEMINI_BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", "5"))
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+# Schema-constrained JSON (response_schema); "auto" = on for models that support it
+GEMINI_JSON_MODE = os.getenv("GEMINI_JSON_MODE", "auto").lower()
+# Gemini 1.0 rejects response_mime_type / response_schema
+LEGACY_MODELS = ("gemini-pro", "gemini-1.0-pro")
+# Calls per article when the answer has no usable summary
+ANALYSIS_ATTEMPTS = int(os.getenv("ANALYSIS_ATTEMPTS", "2"))
+
+# Bump when a prompt changes so cached results from the old prompt are ignored
+ANALYSIS_PROMPT_VERSION = "analysis-v1"
+# Summary + score prompt used when the local label model supplies badge/icon
+SUMMARY_PROMPT_VERSION = "summary-v2"
+SYNTHESIS_PROMPT_VERSION = "synthesis-v1"
+REPAIR_PROMPT_VERSION = "repair-v1"
+
+# Source-name hints behind the heuristic trust score (also the backlog's trust prior)
+OFFICIAL_SOURCE_HINTS = ('google', 'microsoft', 'apple', 'meta', 'official', 'blog')
+TRUSTED_SOURCE_HINTS = ('techcrunch', 'verge', 'wired', 'reuters', 'bbc', 'venturebeat', 'bloomberg')
+
+# Output fields of the analysis prompts
+SUMMARY_PROMPT_FIELD = '"summary": "A detailed, comprehensive analysis (approx 200-300 words). Use HTML tags (<br>, <b>) for formatting. Structure it as:\\n\\n<b>The Core Story</b>\\n[Paragraph explaining what happened]\\n\\n<b>Key Details</b>\\n[Bulleted list or detailed paragraph of facts]\\n\\n<b>Why It Matters</b>\\n[Analysis of impact/significance].",'
+LABEL_PROMPT_FIELDS = [
+    '"trust_badge": "One of: [Official], [Technical], [Strategic], [News]",',
+    '"icon": "A single Lucide icon name (e.g., \'cpu\', \'shield-alert\', \'globe\', \'zap\') that fits best.",',
+    '"trust_score": 85,  // Integer 0-100. 100=Official Docs, 80=Reputable News.',
+    '"trust_reason": "Brief explanation of the score."',
+]
+# Expected output tokens per analyzed article (for TPM budgeting)
+FULL_OUTPUT_TOKENS = 600
+SUMMARY_OUTPUT_TOKENS = 510
+
+
+def source_trust_prior(source: str) -> int:
+    """Trust score (0-100) a source gets before any analysis."""
+    source = (source or '').lower()
+    if any(x in source for x in OFFICIAL_SOURCE_HINTS):
+        return 95
+    if any(x in source for x in TRUSTED_SOURCE_HINTS):
+        return 90
+    return 75
+
+
+def default_labels(article: Dict) -> Dict:
+    """Last-resort values for fields the model never got right (no random variance)."""
+    return {
+        "title": article.get("title", ""),
+        "trust_badge": "News",
+        "icon": "file-text",
+        "trust_score": source_trust_prior(article.get("source", "")),
+        "trust_reason": "Standard news report.",
+    }
+
+
+def _is_schema_rejection(error: Exception) -> bool:
+    text = str(error).lower()
+    return any(k in text for k in ("response_mime_type", "response_schema", "json mode", "mime type"))
 
 class IntelligenceAgent:
-    def __init__(self):
+    def __init__(self, use_cache: bool = True):
+        # Results keyed by story content, shared across runs (see llm_cache.py)
+        self.cache = LLMCache() if use_cache else None
+        # Shared across threads so every call draws from the same RPM/TPM quota
+        self.limiter = RateLimiter()
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key or "YOUR_" in api_key:
             print("ERROR: GEMINI_API_KEY is missing or contains a placeholder!")
         else:
+            # Imported here: the SDK takes ~1s to load and runs that exit early never need it
+            import google.generativeai as genai
             genai.configure(api_key=api_key)
             # Fallback to classic Pro model
-            self.model = genai.GenerativeModel('gemini-pro')
-            print("Intelligence Agent initialized (Model: gemini-pro)")
+            self.model = genai.GenerativeModel(GEMINI_MODEL)
+            print(f"Intelligence Agent initialized (Model: {GEMINI_MODEL})")
+        if GEMINI_JSON_MODE == "auto":
+            self.json_mode = GEMINI_MODEL.split("/")[-1] not in LEGACY_MODELS
+        else:
+            self.json_mode = GEMINI_JSON_MODE in ("1", "true", "yes")
+        # Real prompt/output token counts per call and per run (from usage_metadata)
+        self.usage = TokenUsage()
+        # Badge/icon from the local classifier when one is trained (see label_model.py)
+        self.labels = shared_model()
+        if self.labels:
+            print(f"Local label model loaded (trained {self.labels.trained_at}); prompts ask for the summary and score only.")
+        self.prompt_version = SUMMARY_PROMPT_VERSION if self.labels else ANALYSIS_PROMPT_VERSION
+        self.output_tokens = SUMMARY_OUTPUT_TOKENS if self.labels else FULL_OUTPUT_TOKENS
+
+    def _generate(self, prompt: str, expected_output_tokens: int = 600, schema: Optional[Dict] = None,
+                  kind: str = "analysis", articles: int = 1):
+        """
+        Calls Gemini through the rate limiter (retries 429s with backoff).
+        With a `schema` the answer is constrained to it (JSON mode); token usage is recorded under `kind`.
+        """
+        config = None
+        if schema and self.json_mode:
+            config = {"response_mime_type": "application/json", "response_schema": schema}
+        
+        def call():
+            metrics.incr("llm_calls")
+            if config:
+                return self.model.generate_content(prompt, generation_config=config)
+            return self.model.generate_content(prompt)
+        try:
+            response = self.limiter.call(
+                call,
+                estimated_tokens=estimate_tokens(prompt, expected_output_tokens)
+            )
+        except Exception as e:
+            if config and _is_schema_rejection(e):
+                print(f"  {GEMINI_MODEL} rejected schema-constrained output; using prompt-only JSON from now on.")
+                self.json_mode = False
+                return self._generate(prompt, expected_output_tokens, schema, kind, articles)
+            raise
+        self.usage.record(kind, response, articles, estimated_prompt_tokens=estimate_tokens(prompt))
+        return response
+
+    def _analysis_key(self, article: Dict) -> str:
+        return content_key(self.prompt_version, article['title'], article['summary'][:800])
+
+    def _output_fields(self, indent: str) -> str:
+        """The JSON fields the model must return: summary and score only when badge/icon are predicted locally."""
+        fields = [SUMMARY_PROMPT_FIELD] + (LABEL_PROMPT_FIELDS[2:] if self.labels else LABEL_PROMPT_FIELDS)
+        return ("\n" + indent).join(fields)
+
+    def _with_labels(self, article: Dict, data: Dict) -> Dict:
+        """
+        Fills in the locally predicted badge/icon the shorter prompt didn't ask for. The LLM's own
+        score and reason win; marked label_source "model" so retraining never learns from it.
+        """
+        if not self.labels:
+            return data
+        metrics.incr("labels_local")
+        return {**self.labels.labels(article), "label_source": "model", **data}
+
+    def _analysis_fields(self) -> Dict:
+        return {**SUMMARY_FIELDS, **SCORE_FIELDS} if self.labels else ANALYSIS_FIELDS
+
+    def _complete(self, article: Dict, answer, fields: Dict) -> Optional[Dict]:
+        """
+        Validates one answer against `fields` and repairs just the fields that failed.
+        None when the summary itself is unusable (that's the expensive part: ask again).
+        """
+        clean, bad = validate(answer, fields)
+        if "summary" in bad:
+            metrics.incr("llm_invalid_answers")
+            return None
+        if bad:
+            clean.update(self._repair_fields(article, bad))
+        return self._with_labels(article, clean)
+
+    def _repair_fields(self, article: Dict, bad: List[str]) -> Dict:
+        """
+        Values for fields that came back missing or invalid: the local label model when it
+        covers them, else one small call for just those fields, else plain defaults.
+        """
+        metrics.incr("llm_fields_repaired", len(bad))
+        if self.labels and set(bad) <= set(LABEL_FIELDS):
+            predicted = self.labels.labels(article)
+            return {"label_source": "model", **{name: predicted[name] for name in bad}}
+
+        fields = {name: SYNTHESIS_FIELDS[name] for name in bad}
+        cache_key = content_key(REPAIR_PROMPT_VERSION, article['title'], article.get('summary', '')[:800], *sorted(bad))
+        repaired = self.cache.get(cache_key) if self.cache else None
+        if repaired is None:
+            prompt = f"""
+        A previous answer about this news item was missing some fields. Provide ONLY these fields: {", ".join(bad)}.
+        Title: {article['title']}
+        Source: {article.get('source', '')}
+        Content Snippet: {article.get('summary', '')[:800]}
+
+        Field rules:
+        - trust_badge: one of Official, Technical, Strategic, News
+        - icon: a single Lucide icon name in kebab-case (e.g. 'cpu', 'shield-alert')
+        - trust_score: integer 0-100 (100=Official Docs, 80=Reputable News)
+        - trust_reason / title: one short sentence
+        """
+            try:
+                response = self._generate(prompt, expected_output_tokens=60 * len(bad),
+                                          schema=response_schema(fields), kind="repair")
+                repaired, _ = validate(parse_json(response.text), fields)
+                if self.cache and repaired:
+                    self.cache.put(cache_key, repaired)
+            except Exception as e:
+                print(f"  Repair call failed ({e}); using defaults for {', '.join(bad)}.")
+                repaired = {}
+        defaults = default_labels(article)
+        filled = {name: repaired.get(name, defaults.get(name)) for name in bad}
+        if any(name not in repaired for name in bad):
+            filled["label_source"] = "default"
+        return filled
+
+    def _cached_analysis(self, article: Dict) -> bool:
+        """Applies a cached analysis to the article if there is one."""
+        if not self.cache:
+            return False
+        data = self.cache.get(self._analysis_key(article))
+        if data is None:
+            return False
+        self._apply_analysis(article, data)
+        return True
+
+    def _store_analysis(self, article: Dict, data: Dict):
+        if self.cache:
+            self.cache.put(self._analysis_key(article), data)
 
     def analyze_article(self, article: Dict) -> Dict:
         """
@@ -28,6 +231,10 @@ class IntelligenceAgent:
             article["icon"] = "file-text"
             return article
 
+        if self._cached_analysis(article):
+            print(f"Cache hit: {article['title'][:50]}...")
+            return article
+
         prompt = f"""
         You are an elite intelligence analyst. Analyze this news item:
         Title: {article['title']}
@@ -36,67 +243,245 @@ class IntelligenceAgent:
 
         Output ONLY valid JSON with this structure:
         {{
-            "summary": "A detailed, comprehensive analysis (approx 200-300 words). Use HTML tags (<br>, <b>) for formatting. Structure it as:\\n\\n<b>The Core Story</b>\\n[Paragraph explaining what happened]\\n\\n<b>Key Details</b>\\n[Bulleted list or detailed paragraph of facts]\\n\\n<b>Why It Matters</b>\\n[Analysis of impact/significance].",
-            "trust_badge": "One of: [Official], [Technical], [Strategic], [News]",
-            "icon": "A single Lucide icon name (e.g., 'cpu', 'shield-alert', 'globe', 'zap') that fits best.",
-            "trust_score": 85,  // Integer 0-100. 100=Official Docs, 80=Reputable News.
-            "trust_reason": "Brief explanation of the score."
+            {self._output_fields(indent=" " * 12)}
         }}
         """
         
+        print(f"Analyzing: {article['title'][:50]}...")
+        fields = self._analysis_fields()
+        for attempt in range(1, ANALYSIS_ATTEMPTS + 1):
+            try:
+                response = self._generate(prompt, expected_output_tokens=self.output_tokens,
+                                          schema=response_schema(fields))
+                data = self._complete(article, parse_json(response.text), fields)
+            except Exception as e:
+                print(f"Error analyzing {article['title']}: {e}")
+                break
+            if data is not None:
+                self._apply_analysis(article, data)
+                self._store_analysis(article, data)
+                return article
+            print(f"  No usable summary (attempt {attempt}/{ANALYSIS_ATTEMPTS}).")
+
+        self._apply_heuristic(article)
+        return article
+
+    def analyze_batch(self, articles: List[Dict], max_batch: int = GEMINI_BATCH_SIZE) -> List[Dict]:
+        """
+        Analyzes several articles per Gemini request.
+        Articles are packed into one prompt (shared instructions sent once) and the model
+        answers with a JSON array keyed by "index". Items that come back malformed or
+        missing are retried in smaller batches, then one by one via analyze_article. If the
+        request itself fails, every article is left _unanalyzed (for the backlog), unsplit.
+        """
+        if not articles:
+            return []
+        if not hasattr(self, 'model') or max_batch <= 1 or len(articles) == 1:
+            return [self.analyze_article(a) for a in articles]
+
+        if len(articles) > max_batch:
+            results = []
+            for i in range(0, len(articles), max_batch):
+                results.extend(self.analyze_batch(articles[i:i + max_batch], max_batch=max_batch))
+            return results
+
+        # Only send the articles the cache can't answer
+        pending = [a for a in articles if not self._cached_analysis(a)]
+        if len(pending) < len(articles):
+            print(f"  Cache hit for {len(articles) - len(pending)}/{len(articles)} articles in batch.")
+            self.analyze_batch(pending, max_batch=max_batch)
+            return articles
+
+        items = "\n".join(
+            f"[{i}] Title: {a['title']}\n    Source: {a['source']}\n    Content Snippet: {a['summary'][:800]}"
+            for i, a in enumerate(articles)
+        )
+        prompt = f"""
+        You are an elite intelligence analyst. Analyze EACH of these {len(articles)} news items independently:
+        {items}
+
+        Output ONLY a valid JSON array with one object per item, in this structure:
+        [
+            {{
+                "index": 0,  // The [number] of the item being analyzed
+                {self._output_fields(indent=" " * 16)}
+            }}
+        ]
+        """
+
+        print(f"Analyzing batch of {len(articles)}: {articles[0]['title'][:40]}...")
+        answered = {}
+        fields = self._analysis_fields()
         try:
-            response = self.model.generate_content(prompt)
-            res_text = response.text.strip()
-            
-            # Clean Markdown if present
-            if res_text.startswith("```json"):
-                res_text = res_text[7:]
-            if res_text.startswith("```"):
-                res_text = res_text[3:]
-            if res_text.endswith("```"):
-                res_text = res_text[:-3]
-            
-            res_text = res_text.strip()
-            
-            # Find the first { and last } to extract JSON block
-            start = res_text.find('{')
-            end = res_text.rfind('}') + 1
-            if start == -1 or end == 0:
-                raise ValueError("No JSON block found in response")
-            
-            clean_json = res_text[start:end]
-            data = json.loads(clean_json)
-            
-            article["ai_summary"] = data.get("summary", article["summary"])
-            article["trust_badge"] = data.get("trust_badge", "News")
-            article["icon"] = data.get("icon", "file-text")
-            article["trust_score"] = data.get("trust_score", 50)
-            article["trust_reason"] = data.get("trust_reason", "Standard news report.")
-            
+            response = self._generate(prompt, expected_output_tokens=self.output_tokens * len(articles),
+                                      schema=response_schema(fields, indexed=True), kind="batch",
+                                      articles=len(articles))
         except Exception as e:
-            print(f"Error analyzing {article['title']}: {e}")
-            # Heuristic Fallback (Source-based) + Variance
-            import random
-            variance = random.randint(-3, 3) # Score varies by +/- 3
+            # The call itself failed (quota, outage): smaller batches would fail the same way,
+            # so the whole batch goes back to the backlog instead of being split
+            print(f"Error analyzing batch: {e}")
+            for article in articles:
+                self._apply_heuristic(article)
+            return articles
+
+        try:
+            items = self._split_json_objects(response.text)
+        except ValueError as e:
+            # Blocked/empty candidates have no .text: treated like an unparseable answer
+            print(f"  Batch answer unreadable: {e}")
+            items = []
+        for item in items:
+            idx = item.get("index")
+            if isinstance(idx, int) and 0 <= idx < len(articles) and idx not in answered:
+                # Items without a usable summary stay missing and are retried below
+                data = self._complete(articles[idx], item, fields)
+                if data is not None:
+                    answered[idx] = data
+
+        for idx, item in answered.items():
+            self._apply_analysis(articles[idx], item)
+            self._store_analysis(articles[idx], item)
+
+        missing = [a for i, a in enumerate(articles) if i not in answered]
+        if missing:
+            print(f"  Batch returned {len(answered)}/{len(articles)} items, retrying {len(missing)}...")
+            # Halve the batch each retry so a poisonous item ends up on its own
+            self.analyze_batch(missing, max_batch=max(1, len(articles) // 2))
+
+        return articles
+
+    @staticmethod
+    def _extract_json(res_text: str, opener: str = '{', closer: str = '}') -> str:
+        """Strips markdown fences and returns the outermost JSON block."""
+        return extract_json(res_text, opener, closer)
+
+    @staticmethod
+    def _split_json_objects(res_text: str) -> List[Dict]:
+        """
+        Parses a JSON array response. If the array as a whole is malformed, falls back
+        to scanning for each top-level {...} object and keeps the ones that parse.
+        """
+        data = parse_json(res_text, '[', ']')
+        if isinstance(data, list):
+            return [item for item in data if isinstance(item, dict)]
+
+        objects, depth, start, in_string, escaped = [], 0, None, False, False
+        for i, ch in enumerate(res_text):
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif ch == '\\':
+                    escaped = True
+                elif ch == '"':
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch == '{':
+                if depth == 0:
+                    start = i
+                depth += 1
+            elif ch == '}' and depth > 0:
+                depth -= 1
+                if depth == 0:
+                    try:
+                        item = json.loads(res_text[start:i + 1])
+                        if isinstance(item, dict):
+                            objects.append(item)
+                    except ValueError:
+                        pass # Malformed item: it will be reported missing and retried
+        return objects
+
+    @staticmethod
+    def _apply_analysis(article: Dict, data: Dict):
+        article.pop("_unanalyzed", None)
+        article["ai_summary"] = data.get("summary", article["summary"])
+        article["trust_badge"] = data.get("trust_badge", "News")
+        article["icon"] = data.get("icon", "file-text")
+        article["trust_score"] = data.get("trust_score", 50)
+        article["trust_reason"] = data.get("trust_reason", "Standard news report.")
+        # Who picked the labels: "llm", or "model"/"default" when some were filled in locally
+        article["label_source"] = data.get("label_source", "llm")
+
+    @staticmethod
+    def _apply_heuristic(article: Dict):
+        # Heuristic Fallback (Source-based) + Variance
+        import random
+        variance = random.randint(-3, 3) # Score varies by +/- 3
+        
+        prior = source_trust_prior(article.get('source', ''))
+        if prior == 95:
+            article["trust_score"] = min(98, 95 + variance)
+            article["trust_badge"] = "Official"
+            article["trust_reason"] = "Official Source (Verified)"
+        elif prior == 90:
+            article["trust_score"] = min(98, 90 + variance)
+            article["trust_badge"] = "Trusted"
+            article["trust_reason"] = "Reputable Publisher"
+        else:
+            article["trust_score"] = max(60, 75 + variance)
+            article["trust_badge"] = "News"
+            article["trust_reason"] = "Standard Reporting"
+        
+        article["ai_summary"] = article.get("summary", "Analysis Unavailable")
+        article["icon"] = "file-text"
+        article["label_source"] = "heuristic"
+        # Lets the pipeline put the story back in the backlog instead of shipping the downgrade
+        article["_unanalyzed"] = True
+
+    def analyze_many(self, articles: List[Dict], max_workers: int = GEMINI_CONCURRENCY,
+                     batch_size: int = GEMINI_BATCH_SIZE) -> List[Dict]:
+        """
+        Runs analyze_batch over many articles with several calls in flight.
+        Pacing comes from the shared rate limiter; results keep input order.
+        """
+        if not articles:
+            return []
+        batch_size = max(1, batch_size)
+        batches = [articles[i:i + batch_size] for i in range(0, len(articles), batch_size)]
+        analyze = lambda batch: self.analyze_batch(batch, max_batch=batch_size)
+        
+        if max_workers <= 1 or len(batches) == 1:
+            results = map(analyze, batches)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+                results = list(pool.map(analyze, batches))
+        return [article for batch in results for article in batch]
+
+    def analyze_clusters(self, clusters: List[List[Dict]]) -> List[Dict]:
+        """
+        Analyzes the output of clustering.cluster_articles.
+        Each multi-source cluster becomes ONE article via synthesize_cluster, keeping the
+        first member's link and listing every member in `related_links`. Singletons (and
+        clusters whose synthesis failed) go through the normal analyze_many path.
+        """
+        merged = {}
+        singles = []
+        for i, cluster in enumerate(clusters):
+            if len(cluster) < 2:
+                singles.extend(cluster)
+                continue
             
-            source = article.get('source', '').lower()
-            if any(x in source for x in ['google', 'microsoft', 'apple', 'meta', 'official', 'blog']):
-                article["trust_score"] = min(98, 95 + variance)
-                article["trust_badge"] = "Official"
-                article["trust_reason"] = "Official Source (Verified)"
-            elif any(x in source for x in ['techcrunch', 'verge', 'wired', 'reuters', 'bbc', 'venturebeat', 'bloomberg']):
-                article["trust_score"] = min(98, 90 + variance)
-                article["trust_badge"] = "Trusted"
-                article["trust_reason"] = "Reputable Publisher"
-            else:
-                article["trust_score"] = max(60, 75 + variance)
-                article["trust_badge"] = "News"
-                article["trust_reason"] = "Standard Reporting"
+            print(f"Synthesizing cluster of {len(cluster)}: {cluster[0]['title'][:50]}...")
+            data = self.synthesize_cluster(cluster) if hasattr(self, 'model') else None
+            if not data:
+                singles.extend(cluster)
+                continue
             
-            article["ai_summary"] = article.get("summary", "Analysis Unavailable")
-            article["icon"] = "file-text"
-
-        return article
+            article = dict(cluster[0])
+            article["title"] = data.get("title") or article["title"]
+            self._apply_analysis(article, data)
+            article["related_links"] = [a['link'] for a in cluster]
+            merged[i] = article
+        
+        analyzed = {id(a): a for a in self.analyze_many(singles)}
+        
+        results = []
+        for i, cluster in enumerate(clusters):
+            if i in merged:
+                results.append(merged[i])
+            else:
+                results.extend(analyzed[id(a)] for a in cluster)
+        return results
 
     def synthesize_cluster(self, articles: list) -> Dict:
         """
@@ -108,6 +493,16 @@ class IntelligenceAgent:
         titles = " | ".join([a['title'] for a in articles])
         snippets = " ".join([a.get('summary', '')[:200] for a in articles])
         
+        # Order-independent key: the same set of reports is the same cluster
+        cache_key = content_key(SYNTHESIS_PROMPT_VERSION, *sorted(
+            f"{a['title']}\n{a.get('summary', '')[:200]}" for a in articles
+        ))
+        if self.cache:
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                print(f"Cache hit: cluster of {len(articles)} ({articles[0]['title'][:40]}...)")
+                return cached
+        
         prompt = f"""
         SYNTHESIZE COMMAND:
         Merge these {len(articles)} conflicting/related reports into ONE Master Intelligence Brief.
@@ -126,22 +521,21 @@ class IntelligenceAgent:
         }}
         """
         try:
-            response = self.model.generate_content(prompt)
-            res_text = response.text.strip()
-            
-            # Clean Markdown
-            if res_text.startswith("```json"):
-                res_text = res_text[7:]
-            if res_text.startswith("```"):
-                res_text = res_text[3:]
-            if res_text.endswith("```"):
-                res_text = res_text[:-3]
-            res_text = res_text.strip()
-            
-            clean_json = res_text[res_text.find('{'):res_text.rfind('}')+1]
-            return json.loads(clean_json)
-        except:
+            response = self._generate(prompt, expected_output_tokens=400, schema=response_schema(SYNTHESIS_FIELDS),
+                                      kind="synthesis", articles=len(articles))
+            clean, bad = validate(parse_json(response.text), SYNTHESIS_FIELDS)
+        except Exception as e:
+            print(f"  Synthesis failed: {e}")
             return None # Fallback to using individual articles
+        if "summary" in bad:
+            metrics.incr("llm_invalid_answers")
+            return None
+        if bad:
+            # Repair against the lead report; the summary (the paid part) is kept
+            clean.update(self._repair_fields(articles[0], bad))
+        if self.cache:
+            self.cache.put(cache_key, clean)
+        return clean
 
 if __name__ == "__main__":
     # Test Run
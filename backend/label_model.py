@@ -0,0 +1,327 @@
+"""
+Local classifier for the small per-article labels: trust_badge, icon and category.
+
+Gemini used to return these alongside every summary. They are predictable from
+the title, snippet and source, and the `articles` table (plus the retention
+archive, see retention.py) already holds thousands of labeled examples, so a
+linear model over hashed word n-grams predicts them on the CPU in microseconds:
+- features: title unigrams + bigrams, snippet unigrams and the source name,
+  hashed into LABEL_MODEL_DIM buckets (no vocabulary to store)
+- one multinomial logistic regression per field, trained with plain SGD
+- only rows whose labels came from the LLM are learned from (`label_source`);
+  rows the model, the defaults or the heuristic labeled would feed the model
+  its own guesses back
+
+With a trained model present the analysis prompt asks for the summary and the
+trust score/reason only (see IntelligenceAgent); the score stays the LLM's,
+since a per-badge constant would flatten the reel's trust ranking. The mean
+score and most common reason per badge are kept for answers missing them.
+Retrain from the DB with:
+
+    python backend/label_model.py --retrain [--archive DIR] [--limit N]
+"""
+
+import argparse
+import collections
+import glob
+import gzip
+import json
+import math
+import os
+import random
+import re
+import time
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from local_state import state_path
+
+LABEL_MODEL_PATH = os.getenv("LABEL_MODEL_PATH")  # Default: <BRIEF_CACHE_DIR>/label_model.json.gz
+# "0" keeps Gemini producing every label even when a model file exists
+LOCAL_LABELS = os.getenv("LOCAL_LABELS", "1").lower() not in ("0", "false", "no")
+LABEL_MODEL_DIM = 1 << 18
+LABEL_MIN_EXAMPLES = int(os.getenv("LABEL_MIN_EXAMPLES", "5"))  # Rarer labels are left out of training
+# Predicted categories below this probability keep the source's category
+LABEL_CATEGORY_MIN_CONFIDENCE = float(os.getenv("LABEL_CATEGORY_MIN_CONFIDENCE", "0.6"))
+
+FIELDS = ("trust_badge", "icon", "category")
+# label_source values worth learning from; rows older than the column have none
+TRAINABLE_SOURCES = {None, "llm"}
+# Labels written by IntelligenceAgent._apply_heuristic before label_source existed: not worth learning
+HEURISTIC_REASONS = {"Official Source (Verified)", "Reputable Publisher", "Standard Reporting"}
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9'+#.-]*")
+_TAG = re.compile(r"<[^>]+>")
+
+
+def model_path() -> str:
+    return LABEL_MODEL_PATH or state_path("label_model.json.gz")
+
+
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) % LABEL_MODEL_DIM
+
+
+def features(article: Dict) -> List[int]:
+    """Hashed feature ids of an article (binary features, deduplicated)."""
+    title = _WORD.findall((article.get("title") or "").lower())
+    snippet = _WORD.findall(_TAG.sub(" ", article.get("summary") or "")[:400].lower())
+    names = [f"t:{w}" for w in title]
+    names += [f"b:{a} {b}" for a, b in zip(title, title[1:])]
+    names += [f"s:{w}" for w in snippet]
+    names.append(f"src:{(article.get('source') or '').lower()}")
+    return sorted({_bucket(name) for name in names})
+
+
+def normalize_label(value) -> Optional[str]:
+    """The prompt shows badges as "[Official]"; some rows kept the brackets."""
+    value = str(value or "").strip().strip("[]").strip()
+    return value or None
+
+
+class LinearClassifier:
+    """Multinomial logistic regression over hashed features; weights stored feature-major."""
+
+    def __init__(self, labels: List[str], weights: Optional[Dict[int, List[float]]] = None,
+                 bias: Optional[List[float]] = None):
+        self.labels = labels
+        self.weights = weights or {}
+        self.bias = bias or [0.0] * len(labels)
+
+    def scores(self, feats: List[int]) -> List[float]:
+        totals = list(self.bias)
+        scale = 1 / math.sqrt(len(feats) or 1)
+        for f in feats:
+            row = self.weights.get(f)
+            if row:
+                for k, w in enumerate(row):
+                    totals[k] += w * scale
+        return totals
+
+    def predict(self, feats: List[int]) -> Tuple[str, float]:
+        """(label, probability)"""
+        totals = self.scores(feats)
+        top = max(totals)
+        exp = [math.exp(s - top) for s in totals]
+        best = max(range(len(exp)), key=exp.__getitem__)
+        return self.labels[best], exp[best] / sum(exp)
+
+    def fit(self, examples: List[Tuple[List[int], str]], epochs: int = 8, lr: float = 0.5,
+            l2: float = 1e-6, seed: int = 13):
+        index = {label: k for k, label in enumerate(self.labels)}
+        rng = random.Random(seed)
+        examples = list(examples)
+        n = len(self.labels)
+        for epoch in range(epochs):
+            rng.shuffle(examples)
+            rate = lr / (1 + epoch)
+            for feats, label in examples:
+                totals = self.scores(feats)
+                top = max(totals)
+                exp = [math.exp(s - top) for s in totals]
+                z = sum(exp)
+                # Softmax cross-entropy gradient: p - onehot
+                grad = [e / z for e in exp]
+                grad[index[label]] -= 1
+                scale = 1 / math.sqrt(len(feats) or 1)
+                for f in feats:
+                    row = self.weights.setdefault(f, [0.0] * n)
+                    for k in range(n):
+                        row[k] -= rate * (grad[k] * scale + l2 * row[k])
+                for k in range(n):
+                    self.bias[k] -= rate * grad[k]
+
+    def to_json(self) -> Dict:
+        # Rounded and pruned: most buckets end up with near-zero weights
+        weights = {str(f): [round(w, 4) for w in row] for f, row in self.weights.items()
+                   if max(abs(w) for w in row) >= 1e-3}
+        return {"labels": self.labels, "bias": [round(b, 4) for b in self.bias], "weights": weights}
+
+    @classmethod
+    def from_json(cls, data: Dict) -> "LinearClassifier":
+        return cls(data["labels"], {int(f): row for f, row in data["weights"].items()}, data["bias"])
+
+
+class LabelModel:
+    def __init__(self, classifiers: Dict[str, LinearClassifier], badge_scores: Dict[str, Dict],
+                 trained_at: Optional[str] = None, metrics: Optional[Dict] = None):
+        self.classifiers = classifiers
+        self.badge_scores = badge_scores  # badge -> {"score", "reason"}
+        self.trained_at = trained_at
+        self.metrics = metrics or {}
+
+    def predict(self, article: Dict) -> Dict[str, Tuple[str, float]]:
+        """{field: (label, probability)} for every field the model knows."""
+        feats = features(article)
+        return {field: clf.predict(feats) for field, clf in self.classifiers.items()}
+
+    def labels(self, article: Dict) -> Dict:
+        """Badge and icon, plus the badge's usual trust score and reason for answers that lack them."""
+        predicted = self.predict(article)
+        badge = predicted["trust_badge"][0] if "trust_badge" in predicted else "News"
+        known = self.badge_scores.get(badge, {})
+        return {
+            "trust_badge": badge,
+            "icon": predicted["icon"][0] if "icon" in predicted else "file-text",
+            "trust_score": known.get("score", 50),
+            "trust_reason": known.get("reason", "Standard news report."),
+        }
+
+    def category(self, article: Dict, default: str) -> str:
+        """Predicted category when the model is confident, else `default`."""
+        clf = self.classifiers.get("category")
+        if not clf:
+            return default
+        label, probability = clf.predict(features(article))
+        return label if probability >= LABEL_CATEGORY_MIN_CONFIDENCE else default
+
+    # --- Persistence ---
+
+    def save(self, path: Optional[str] = None):
+        path = path or model_path()
+        data = {
+            "trained_at": self.trained_at,
+            "dim": LABEL_MODEL_DIM,
+            "metrics": self.metrics,
+            "badge_scores": self.badge_scores,
+            "classifiers": {field: clf.to_json() for field, clf in self.classifiers.items()},
+        }
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional["LabelModel"]:
+        path = path or model_path()
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("dim") != LABEL_MODEL_DIM:
+            print(f"Label model at {path} uses a different feature size; retrain it.")
+            return None
+        classifiers = {field: LinearClassifier.from_json(c) for field, c in data["classifiers"].items()}
+        return cls(classifiers, data.get("badge_scores", {}), data.get("trained_at"), data.get("metrics"))
+
+
+_loaded: Dict[str, Optional[LabelModel]] = {}
+
+
+def shared_model() -> Optional[LabelModel]:
+    """The trained model, loaded once per process; None when there is none or LOCAL_LABELS=0."""
+    if not LOCAL_LABELS:
+        return None
+    path = model_path()
+    if path not in _loaded:
+        _loaded[path] = LabelModel.load(path)
+    return _loaded[path]
+
+
+# --- Training ---
+
+def usable_rows(rows: Iterable[Dict]) -> List[Dict]:
+    """Rows the LLM labeled (not this model, the defaults or the heuristic fallback), one per link."""
+    seen, usable = set(), []
+    for row in rows:
+        if row.get("label_source") not in TRAINABLE_SOURCES:
+            continue
+        if not row.get("title") or row.get("trust_reason") in HEURISTIC_REASONS:
+            continue
+        if "Unavailable" in (row.get("ai_summary") or "") or row.get("link") in seen:
+            continue
+        seen.add(row.get("link"))
+        usable.append(row)
+    return usable
+
+
+def train(rows: List[Dict], holdout: float = 0.1, seed: int = 13) -> LabelModel:
+    rows = usable_rows(rows)
+    rng = random.Random(seed)
+    rng.shuffle(rows)
+    cut = int(len(rows) * (1 - holdout)) if len(rows) >= 50 else len(rows)
+    train_rows, test_rows = rows[:cut], rows[cut:]
+    feats = {id(r): features(r) for r in rows}
+
+    classifiers, report = {}, {"rows": len(rows)}
+    for field in FIELDS:
+        counts = collections.Counter(normalize_label(r.get(field)) for r in train_rows)
+        labels = sorted(l for l, n in counts.items() if l and n >= LABEL_MIN_EXAMPLES)
+        if len(labels) < 2:
+            print(f"  {field}: not enough labeled rows ({dict(counts)}), skipped.")
+            continue
+        examples = [(feats[id(r)], normalize_label(r.get(field))) for r in train_rows
+                    if normalize_label(r.get(field)) in labels]
+        clf = LinearClassifier(labels)
+        clf.fit(examples, seed=seed)
+        classifiers[field] = clf
+
+        tested = [r for r in test_rows if normalize_label(r.get(field)) in labels]
+        correct = sum(clf.predict(feats[id(r)])[0] == normalize_label(r.get(field)) for r in tested)
+        accuracy = round(correct / len(tested), 3) if tested else None
+        report[field] = {"labels": len(labels), "examples": len(examples), "holdout_accuracy": accuracy}
+        print(f"  {field}: {len(labels)} labels, {len(examples)} examples, holdout accuracy {accuracy}")
+
+    badge_scores = {}
+    by_badge = collections.defaultdict(list)
+    for r in train_rows:
+        badge = normalize_label(r.get("trust_badge"))
+        if badge and isinstance(r.get("trust_score"), (int, float)):
+            by_badge[badge].append(r)
+    for badge, members in by_badge.items():
+        reasons = collections.Counter(r.get("trust_reason") for r in members if r.get("trust_reason"))
+        badge_scores[badge] = {
+            "score": round(sum(r["trust_score"] for r in members) / len(members)),
+            "reason": reasons.most_common(1)[0][0] if reasons else "Standard news report.",
+        }
+
+    trained_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    return LabelModel(classifiers, badge_scores, trained_at, report)
+
+
+def archived_rows(directory: str) -> List[Dict]:
+    """Rows the retention purge archived (retention.ArticleArchive files)."""
+    rows = []
+    for path in sorted(glob.glob(os.path.join(directory, "articles-*.jsonl.gz"))):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            rows.extend(json.loads(line) for line in f if line.strip())
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local badge/icon/category classifier")
+    parser.add_argument("--retrain", action="store_true", help="Train from the articles table and save the model")
+    parser.add_argument("--archive", default=os.getenv("RETENTION_ARCHIVE_DIR"),
+                        help="Also train on purged rows archived here (default: RETENTION_ARCHIVE_DIR)")
+    parser.add_argument("--limit", type=int, default=20000, help="Max rows to read from the DB")
+    parser.add_argument("--out", default=None, help="Where to write the model (default: LABEL_MODEL_PATH)")
+    args = parser.parse_args()
+
+    if not args.retrain:
+        model = LabelModel.load(args.out)
+        print(json.dumps({"path": args.out or model_path(), "trained_at": model and model.trained_at,
+                          "metrics": model and model.metrics}, indent=2))
+        return
+
+    from dotenv import load_dotenv
+    if os.path.exists("backend/.env"): load_dotenv("backend/.env")
+    else: load_dotenv()
+    from database_manager import DatabaseManager
+    rows = DatabaseManager().get_training_rows(limit=args.limit)
+    print(f"Loaded {len(rows)} rows from the articles table.")
+    if args.archive and os.path.isdir(args.archive):
+        archived = archived_rows(args.archive)
+        print(f"Loaded {len(archived)} archived rows from {args.archive}.")
+        rows += archived
+
+    start = time.perf_counter()
+    model = train(rows)
+    if not model.classifiers:
+        raise SystemExit("Nothing to train on; keep the existing model.")
+    model.save(args.out)
+    print(f"Trained in {time.perf_counter() - start:.1f}s -> {args.out or model_path()}")
+
+
+if __name__ == "__main__":
+    main()
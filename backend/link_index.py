@@ -0,0 +1,104 @@
+"""
+Local index of links already stored in Supabase (the 48h retention window).
+
+Lets the dedup filter answer "is this link already in the DB?" without a
+round trip: a link whose key is in the table is known, anything else is new.
+Our own uploads are added as they land; rows written by anyone else show up
+at the next rebuild.
+
+The table lives in SQLite next to the other pipeline state and is rebuilt
+from the DB when it is missing or older than LINK_INDEX_MAX_AGE_HOURS. Entries
+are canonical link keys, so redirect/tracking-param variants of a stored link
+count as known too.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, List, Optional, Set
+
+from local_state import state_path
+from url_canon import link_key
+
+LINK_INDEX_RETENTION_HOURS = float(os.getenv("LINK_INDEX_RETENTION_HOURS", "48"))
+LINK_INDEX_MAX_AGE_HOURS = float(os.getenv("LINK_INDEX_MAX_AGE_HOURS", "6"))
+
+# Bump when the stored key format changes so old index files get rebuilt
+INDEX_FORMAT = 2
+
+
+def normalize_link(link: str) -> str:
+    """Entries are stored as canonical link keys (see url_canon.py)."""
+    return link_key(link)
+
+
+class LinkIndex:
+    def __init__(self, path: Optional[str] = None, retention_hours: float = LINK_INDEX_RETENTION_HOURS,
+                 max_age_hours: float = LINK_INDEX_MAX_AGE_HOURS):
+        self.path = path or state_path("link_index.sqlite3")
+        self.retention_seconds = retention_hours * 3600
+        self.max_age_seconds = max_age_hours * 3600
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            create table if not exists known_links (
+                link text primary key,
+                seen_at real not null
+            );
+            create table if not exists link_index_meta (
+                key text primary key,
+                value real
+            );
+        """)
+        self._prune()
+
+    def _prune(self):
+        with self._lock:
+            self._conn.execute("delete from known_links where seen_at < ?", (time.time() - self.retention_seconds,))
+            self._conn.commit()
+
+    def is_stale(self) -> bool:
+        """True if the index was never built or hasn't been rebuilt from the DB recently."""
+        with self._lock:
+            row = self._conn.execute("select value from link_index_meta where key = 'rebuilt_at'").fetchone()
+            fmt = self._conn.execute("select value from link_index_meta where key = 'format'").fetchone()
+        if fmt is None or fmt[0] != INDEX_FORMAT:
+            return True
+        return row is None or time.time() - row[0] > self.max_age_seconds
+
+    def rebuild(self, links: Iterable[str]):
+        """Replaces the index with the authoritative set of links from the DB."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("delete from known_links")
+            self._conn.executemany(
+                "insert or replace into known_links (link, seen_at) values (?, ?)",
+                [(normalize_link(l), now) for l in links if l]
+            )
+            self._conn.execute("insert or replace into link_index_meta (key, value) values ('rebuilt_at', ?)", (now,))
+            self._conn.execute("insert or replace into link_index_meta (key, value) values ('format', ?)", (INDEX_FORMAT,))
+            self._conn.commit()
+
+    def add(self, links: Iterable[str]):
+        """Records links that were just written to the DB."""
+        now = time.time()
+        normalized = [normalize_link(l) for l in links if l]
+        with self._lock:
+            self._conn.executemany(
+                "insert or ignore into known_links (link, seen_at) values (?, ?)",
+                [(l, now) for l in normalized]
+            )
+            self._conn.commit()
+
+    def known(self, links: List[str]) -> Set[str]:
+        """The links (the caller's original strings) that are in the index."""
+        known = set()
+        with self._lock:
+            for link in links:
+                hit = self._conn.execute(
+                    "select 1 from known_links where link = ?", (normalize_link(link),)
+                ).fetchone()
+                if hit:
+                    known.add(link)
+        return known
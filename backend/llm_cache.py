@@ -0,0 +1,92 @@
+"""
+Content-addressed cache for Gemini results.
+
+Keys are a hash of the normalized title + snippet + prompt version, so the same
+story under a different URL (tracking params, redirect wrappers) or a re-run
+after a crash is answered locally instead of spending quota.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+from local_state import state_path
+from instrumentation import metrics
+
+LLM_CACHE_TTL_HOURS = float(os.getenv("LLM_CACHE_TTL_HOURS", "72"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercases, drops HTML tags and collapses whitespace."""
+    return _SPACE_RE.sub(" ", _TAG_RE.sub(" ", text or "")).strip().lower()
+
+
+def content_key(prompt_version: str, *parts: str) -> str:
+    payload = "\x1f".join([prompt_version] + [normalize_text(p) for p in parts])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: Optional[str] = None, ttl_hours: float = LLM_CACHE_TTL_HOURS,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path or state_path("llm_cache.sqlite3")
+        self.ttl_seconds = ttl_hours * 3600
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # Analysis runs on a thread pool, so share one connection behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            create table if not exists llm_results (
+                key text primary key,
+                value text not null,
+                created_at real not null,
+                last_used real not null
+            )
+        """)
+        self._conn.execute("create index if not exists llm_results_last_used on llm_results (last_used)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("select value, created_at from llm_results where key = ?", (key,)).fetchone()
+            if not row or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                metrics.incr("llm_cache_misses")
+                return None
+            self._conn.execute("update llm_results set last_used = ? where key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            metrics.incr("llm_cache_hits")
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "insert or replace into llm_results (key, value, created_at, last_used) values (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drops expired rows, then the least recently used ones beyond max_entries."""
+        self._conn.execute("delete from llm_results where created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "delete from llm_results where key in ("
+            "  select key from llm_results order by last_used desc limit -1 offset ?"
+            ")",
+            (self.max_entries,)
+        )
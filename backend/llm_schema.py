@@ -0,0 +1,128 @@
+"""
+Typed output schemas for the Gemini prompts, and validation/repair of answers.
+
+The prompts used to ask for "ONLY valid JSON" and the answer was cut from the
+first "{" to the last "}"; one stray character threw the whole (paid) response
+away. Now each prompt sends a response_schema with response_mime_type
+"application/json" so the model is constrained to the shape, and every answer
+is still checked field by field here:
+- values are coerced where the intent is clear ("85" -> 85, "[Official]" ->
+  "Official", "Shield Alert" -> "shield-alert") and clamped to their range
+- fields that are missing or still invalid are reported by name, so the agent
+  can ask again for just those fields (or fill them locally) while keeping
+  the rest of the answer
+
+Schemas use Gemini's OpenAPI subset: type, enum, properties, required, items.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+TRUST_BADGES = ["Official", "Technical", "Strategic", "News"]
+
+# name -> spec; "type" is the JSON type, the other keys are checked by validate()
+SUMMARY_FIELDS = {
+    "summary": {"type": "string", "min_length": 40},
+}
+# Badge and icon are what the local label model predicts; the score always comes from the LLM when it can
+BADGE_FIELDS = {
+    "trust_badge": {"type": "string", "enum": TRUST_BADGES},
+    "icon": {"type": "string", "pattern": r"^[a-z0-9]+(-[a-z0-9]+)*$"},
+}
+SCORE_FIELDS = {
+    "trust_score": {"type": "integer", "minimum": 0, "maximum": 100},
+    "trust_reason": {"type": "string", "min_length": 3},
+}
+LABEL_FIELDS = {**BADGE_FIELDS, **SCORE_FIELDS}
+ANALYSIS_FIELDS = {**SUMMARY_FIELDS, **LABEL_FIELDS}
+SYNTHESIS_FIELDS = {"title": {"type": "string", "min_length": 10}, **ANALYSIS_FIELDS}
+
+
+def response_schema(fields: Dict[str, Dict], indexed: bool = False) -> Dict:
+    """The Gemini response_schema for `fields`; `indexed` wraps it in an array of {"index", ...}."""
+    properties = {}
+    for name, spec in fields.items():
+        prop = {"type": spec["type"]}
+        if "enum" in spec:
+            prop["enum"] = list(spec["enum"])
+        properties[name] = prop
+    item = {"type": "object", "properties": properties, "required": list(fields)}
+    if not indexed:
+        return item
+    item["properties"] = {"index": {"type": "integer"}, **properties}
+    item["required"] = ["index"] + list(fields)
+    return {"type": "array", "items": item}
+
+
+def _coerce(value: Any, spec: Dict) -> Any:
+    """The value as the spec's type, or None when it can't be read as one."""
+    if spec["type"] == "integer":
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, (int, float)):
+            value = int(round(value))
+        elif isinstance(value, str) and re.fullmatch(r"\s*-?\d+(\.\d+)?\s*%?\s*", value):
+            value = int(round(float(value.strip().rstrip("%"))))
+        else:
+            return None
+        return max(spec.get("minimum", value), min(spec.get("maximum", value), value))
+
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    if "enum" in spec:
+        wanted = value.strip("[]").strip().lower()
+        return next((option for option in spec["enum"] if option.lower() == wanted), None)
+    if "pattern" in spec:
+        value = re.sub(r"[\s_]+", "-", value.strip("'\"").lower())
+    return value
+
+
+def validate(data: Any, fields: Dict[str, Dict]) -> Tuple[Dict, List[str]]:
+    """(clean values that passed, names of fields that are missing or invalid)."""
+    if not isinstance(data, dict):
+        return {}, list(fields)
+    clean, bad = {}, []
+    for name, spec in fields.items():
+        value = _coerce(data.get(name), spec)
+        ok = value is not None
+        if ok and isinstance(value, str):
+            ok = len(value) >= spec.get("min_length", 1)
+            if ok and "pattern" in spec:
+                ok = re.match(spec["pattern"], value) is not None
+        if ok:
+            clean[name] = value
+        else:
+            bad.append(name)
+    return clean, bad
+
+
+def extract_json(text: str, opener: str = '{', closer: str = '}') -> str:
+    """Strips markdown fences and returns the outermost JSON block (for unconstrained answers)."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    text = text.strip()
+
+    start = text.find(opener)
+    end = text.rfind(closer) + 1
+    if start == -1 or end == 0:
+        raise ValueError("No JSON block found in response")
+    return text[start:end]
+
+
+def parse_json(text: str, opener: str = '{', closer: str = '}') -> Optional[Any]:
+    """A schema-constrained answer parses as is; anything else goes through extract_json."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+    try:
+        return json.loads(extract_json(text, opener, closer))
+    except ValueError:
+        return None
@@ -0,0 +1,17 @@
+"""
+Local on-disk state shared by the pipeline (feed validators, caches, journals).
+
+Everything lives under one directory so the GitHub Action can persist it
+between runs with a single `actions/cache` step.
+"""
+
+import os
+
+# Override with BRIEF_CACHE_DIR on CI runners or when running from another cwd
+STATE_DIR = os.getenv("BRIEF_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+
+
+def state_path(filename: str) -> str:
+    """Returns the absolute path of a state file, creating the directory if needed."""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return os.path.join(STATE_DIR, filename)
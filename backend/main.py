@@ -1,11 +1,22 @@
 from ingestion_engine import IngestionEngine
-from intelligence_agent import IntelligenceAgent
+from intelligence_agent import IntelligenceAgent, GEMINI_CONCURRENCY, GEMINI_BATCH_SIZE
 from database_manager import DatabaseManager
 from push_notifier import send_news_notification
+from clustering import cluster_articles
+from watchlist_engine import WatchlistEngine
+from reel_builder import build_reel_stories
+from feed_snapshots import publish_feed_snapshots, SNAPSHOTS_ENABLED
+from backlog_queue import BacklogQueue, select_stories, LLM_STORY_BUDGET
+from instrumentation import metrics, REPORT_TO_DB
+from run_journal import RunJournal
+from http_client import shared_client
+from url_canon import canonical_url
 from dotenv import load_dotenv
+import argparse
 import time
 import json
 import os
+import uuid
 import datetime
 
 # 1. Load Environment Variables (Only for local dev)
@@ -16,177 +27,335 @@ elif os.path.exists("backend/.env"):
     load_dotenv("backend/.env")
     print("Local backend/.env loaded.")
 
-def main():
-    print("=== STARTING DAILY BRIEF PIPELINE ===")
-    
-    # Debug Environment
-    print(f"DEBUG: SUPABASE_URL exists: {os.getenv('SUPABASE_URL') is not None}")
-    print(f"DEBUG: SUPABASE_KEY exists: {os.getenv('SUPABASE_KEY') is not None}")
-    
-    # 1. Initialize Components
-    ingestion = IngestionEngine()
-    intel = IntelligenceAgent()
-    db = DatabaseManager()
-    
-    # 2. Ingest Data (Friendly RSS)
-    print("\n--- STEP 1: INGESTION ---")
-    raw_articles = ingestion.run_friendly_ingestion()
-    print(f"Total Raw Articles: {len(raw_articles)}")
-    
-    # Shuffle articles to ensure the top of the feed has a healthy mix of categories
-    import random
-    random.shuffle(raw_articles)
-    
-    if not raw_articles:
-        print("SKIP: No articles found in the last 24h window. Notification not sent.")
-        return
-
-    # 3. Intelligence Layer (Analyze & Summarize)
-    print("\n--- STEP 2: INTELLIGENCE ANALYSIS ---")
-    
-    # Filter out articles that already exist in DB to save Gemini Quota
-    all_links = [a['link'] for a in raw_articles]
-    existing_links = set(db.get_existing_links(all_links))
-    
-    new_articles = [a for a in raw_articles if a['link'] not in existing_links]
-    print(f"Filtering: {len(raw_articles)} raw -> {len(new_articles)} new articles (Skipped {len(existing_links)} existing)")
-    
-    if not new_articles:
-        print("SKIP: No new articles to process.")
-        return
-
-    processed_articles = []
-    fail_count = 0
-    
-    for article in new_articles:
-        # Skip if title is too short or clearly junk (basic filter)
-        if len(article['title']) < 15: 
-            continue
-            
-        print(f"Analyzing: {article['title'][:50]}...")
-        enriched_article = intel.analyze_article(article)
+# Stories analyzed (and flushed to Supabase) per checkpoint
+ANALYSIS_CHUNK_SIZE = int(os.getenv("ANALYSIS_CHUNK_SIZE", str(GEMINI_CONCURRENCY * GEMINI_BATCH_SIZE)))
+
+class Pipeline:
+    """
+    The pipeline's clients plus one method per stage.
+    A cron run builds one per process; daemon.py keeps one warm and reuses it across runs.
+    """
+
+    def __init__(self):
+        self.ingestion = IngestionEngine()
+        self.db = DatabaseManager()
+        # Stories the LLM budget didn't reach yet, carried across runs (see backlog_queue.py)
+        self.backlog = BacklogQueue()
+        self._intel = None
+        self._watchlists = None
+        # Analyses this run's analyze() got back and how many of them failed (_unanalyzed)
+        self.stories_attempted = 0
+        self.stories_failed = 0
+
+    @property
+    def intel(self) -> IntelligenceAgent:
+        # Built on first analysis: runs that stop at "no new articles" never load the Gemini SDK
+        if self._intel is None:
+            self._intel = IntelligenceAgent()
+        return self._intel
+
+    def watchlist_rules(self) -> list:
+        """user_watchlists rows, fetched once per run (prioritization and alerts both use them)."""
+        if self._watchlists is None:
+            self._watchlists = self.db.get_all_watchlists()
+        return self._watchlists
+
+    def run(self, journal: RunJournal, raw_articles: list = None) -> str:
+        """Runs every stage. Returns the run status recorded in the run report."""
+        print(f"=== STARTING DAILY BRIEF PIPELINE (run {journal.run_id}) ===")
         
-        # Check for Critical Failure (Gemini Down)
-        if enriched_article.get("ai_summary") == "Analysis Failed":
-            print("Gemini Failed. Marking for Fallback...")
-            fail_count += 1
+        # Debug Environment
+        print(f"DEBUG: SUPABASE_URL exists: {os.getenv('SUPABASE_URL') is not None}")
+        print(f"DEBUG: SUPABASE_KEY exists: {os.getenv('SUPABASE_KEY') is not None}")
         
-        processed_articles.append(enriched_article)
-        # Gemini 1.5 Flash Free Tier: 15 RPM limit (~1 req every 4 seconds)
-        time.sleep(4)
-
-    # Fallback Mechanism
-    if fail_count > len(new_articles) * 0.5: # If >50% failed
-        print("\n!!! GEMINI CRITICAL FAILURE DETECTED !!!")
-        print("Falling back to Tier 1 (NewsData.io)...")
-        tier1_articles = ingestion.fetch_newsdata()
-        processed_articles.extend(tier1_articles) # Add Tier 1 (Pre-trusted)
-
-    # 4. Final Deduplication (Safeguard against Tier 1 overlaps)
-    final_articles = []
-    seen_links = set()
-    for art in processed_articles:
-        if art['link'] not in seen_links:
-            final_articles.append(art)
-            seen_links.add(art['link'])
-    processed_articles = final_articles
-
-    print(f"\n--- STEP 3: DATABASE UPLOAD ({len(processed_articles)} unique articles) ---")
-    if processed_articles:
-        db.upload_batch(processed_articles)
-    else:
-        print("SKIP: No processed articles to upload.")
-    
-    # Feature 9: The Morning Reel (Top 3)
-    # -----------------------------------
-    if processed_articles:
-        print("\n--- FEATURE 9: GENERATING MORNING REEL (DIVERSE) ---")
+        if REPORT_TO_DB:
+            metrics.on_finish(self.db.save_run_report)
+        self._watchlists = None
         
-        # Strategy: Fetch top 1 article from each known category in the last 24h from DB
-        # This ensures diversity even if the current ingestion batch was homogenous
-        target_categories = [
-            "World News", "Technology", "Business", "Science", "Health", 
-            "Sports", "Entertainment", "India News", "AI & Frontiers", 
-            "Politics", "Cybersecurity"
-        ]
-        diverse_selection = []
+        # 2. Ingest Data (Friendly RSS)
+        print("\n--- STEP 1: INGESTION ---")
+        raw_articles = self.ingest(journal, raw_articles)
+        print(f"Total Raw Articles: {len(raw_articles)}")
+        
+        if not raw_articles:
+            print("SKIP: No articles found in the last 24h window. Notification not sent.")
+            return "skipped_no_articles"
+
+        # 3. Intelligence Layer (Analyze & Summarize)
+        print("\n--- STEP 2: INTELLIGENCE ANALYSIS ---")
+        new_articles = self.filter_new(journal, raw_articles)
+        if not new_articles:
+            print("SKIP: No new articles to process.")
+            return "skipped_no_new_articles"
+
+        # Streams analyzed articles to Supabase as they are produced; the journal tracks what landed
+        writer = self.db.article_writer(on_uploaded=journal.mark_uploaded)
+        processed_articles = self.analyze(journal, new_articles, writer)
+        processed_articles = self.fallback(journal, processed_articles, writer)
+
+        print(f"\n--- STEP 3: DATABASE UPLOAD ({len(processed_articles)} unique articles) ---")
+        if processed_articles:
+            self.upload(writer)
+        else:
+            print("SKIP: No processed articles to upload.")
+        
+        # Static per-category pages so app opens don't each run a live query
+        if processed_articles and SNAPSHOTS_ENABLED and not journal.stage_done("publish"):
+            print("\n--- STEP 3b: PUBLISHING FEED SNAPSHOTS ---")
+            self.publish()
+            journal.save_stage("publish")
+        
+        # Feature 9: The Morning Reel (Top 3)
+        # -----------------------------------
+        if processed_articles and not journal.stage_done("reel"):
+            print("\n--- FEATURE 9: GENERATING MORNING REEL (DIVERSE) ---")
+            self.reel(processed_articles)
+            journal.save_stage("reel")
+
+        # Feature 10: Watchlist Alerts
+        # -----------------------------------
+        print("\n--- FEATURE 10: CHECKING WATCHLISTS ---")
+        if journal.stage_done("watchlists"):
+            print("SKIP: Watchlist alerts already sent in this run.")
+        else:
+            self.watchlists(processed_articles)
+            journal.save_stage("watchlists")
+
+        # 5. Send Push Notification (General)
+        print("\n--- STEP 4: PUSH NOTIFICATION ---")
+        if processed_articles and not journal.stage_done("notification"):
+            self.notify(processed_articles)
+            journal.save_stage("notification")
+        
+        # 6. Cleanup
+        print("\n--- STEP 5: CLEANUP ---")
+        self.cleanup()
+        
+        journal.save_stage("complete")
+        print("\n=== PIPELINE COMPLETE ===")
+        return "complete"
+
+    # --- Stages ---
+
+    def ingest(self, journal: RunJournal, raw_articles: list = None) -> list:
+        """Fetches every source (or takes `raw_articles` already fetched by the daemon)."""
+        restored = journal.get_stage("ingestion")
+        if restored is not None:
+            print(f"Resuming: {len(restored)} raw articles restored from run journal.")
+            raw_articles = restored
+        else:
+            if raw_articles is None:
+                with metrics.span("ingestion"):
+                    raw_articles = self.ingestion.run_friendly_ingestion()
+            # (No shuffle: analysis order now comes from the backlog's category-balanced priority)
+            journal.save_stage("ingestion", raw_articles)
+        metrics.incr("articles_raw", len(raw_articles))
+        return raw_articles
+
+    def filter_new(self, journal: RunJournal, raw_articles: list) -> list:
+        """Drops articles already in the DB (saves Gemini quota)."""
+        # (On resume, this run's own micro-batches are in the DB, so reuse the first answer)
+        new_articles = journal.get_stage("filtering")
+        if new_articles is None:
+            # Two spellings of one story (aggregator wrapper vs direct link) are analyzed once
+            by_canonical = {}
+            for a in raw_articles:
+                by_canonical.setdefault(canonical_url(a['link']), a)
+            unique = list(by_canonical.values())
+            if len(unique) < len(raw_articles):
+                print(f"Filtering: {len(raw_articles) - len(unique)} duplicate links collapsed.")
+            all_links = [a['link'] for a in unique]
+            with metrics.span("filtering"):
+                existing_links = set(self.db.get_existing_links(all_links))
+            
+            new_articles = [a for a in unique if a['link'] not in existing_links]
+            # Teaches the source scheduler which feeds keep repeating what we already have
+            self.ingestion.scheduler.record_novelty(self.ingestion.sources["friendly_sources"], unique, existing_links)
+            print(f"Filtering: {len(raw_articles)} raw -> {len(new_articles)} new articles (Skipped {len(existing_links)} existing)")
+            journal.save_stage("filtering", new_articles)
+        return new_articles
+
+    def backlog_candidates(self, candidates: list) -> list:
+        """Stories waiting from earlier runs that aren't in this batch or the DB yet."""
+        seen = {canonical_url(a['link']) for a in candidates}
+        waiting = [a for a in self.backlog.articles() if canonical_url(a['link']) not in seen]
+        if waiting:
+            stored = set(self.db.get_existing_links([a['link'] for a in waiting]))
+            self.backlog.remove(stored)
+            waiting = [a for a in waiting if a['link'] not in stored]
+            print(f"Backlog: {len(waiting)} stories carried over from earlier runs.")
+        metrics.incr("backlog_carried", len(waiting))
+        return waiting
+
+    def prioritize(self, clusters: list) -> list:
+        """Picks the stories this run's LLM budget covers; the rest go to the backlog."""
+        # Without a model nothing is spent, so there is nothing to ration
+        budget = LLM_STORY_BUDGET if hasattr(self.intel, 'model') else 0
+        watchers = WatchlistEngine(self.watchlist_rules()).subscriber_count
+        chosen, deferred = select_stories(clusters, budget=budget, watchers=watchers)
+        if deferred:
+            self.backlog.push(a for c in deferred for a in c)
+            print(f"Backlog: {len(deferred)} lower-priority stories deferred (LLM budget {budget} stories/run).")
+        metrics.incr("stories_deferred", len(deferred))
+        return chosen
+
+    def analyze(self, journal: RunJournal, new_articles: list, writer) -> list:
+        """Clusters, analyzes the top stories in checkpointed chunks and streams results to the writer."""
+        # Skip if title is too short or clearly junk (basic filter)
+        candidates = [a for a in new_articles if len(a['title']) >= 15]
+        candidates += self.backlog_candidates(candidates)
         
-        print("Fetching Top Story for each category from DB...")
-        for cat in target_categories:
-            try:
-                # Get the single highest rated article for this category from top 50 recent
-                # Get the single highest rated article for this category from top 50 recent
-                res = db.client.from_('articles')\
-                    .select('*')\
-                    .eq('category', cat)\
-                    .order('published', desc=True)\
-                    .limit(3)\
-                    .execute() # Get top 3 latest, then pick highest score
-                
-                # Sort these 3 by trust_score locally to get "Best of Latest"
-                if res.data:
-                    best_recent = sorted(res.data, key=lambda x: x.get('trust_score', 0), reverse=True)[0]
-                    diverse_selection.append(best_recent)
-            except Exception as e:
-                print(f"Failed to fetch for {cat}: {e}")
-                continue
-
-        # If DB fetch yields too few, fallback to current batch top scorers
-        if len(diverse_selection) < 3:
-             print("Warning: DB Diversity fetch low. Falling back to mixed mode.")
-             sorted_current = sorted(processed_articles, key=lambda x: x.get('trust_score', 0), reverse=True)
-             diverse_selection.extend(sorted_current[:3])
+        # Group near-duplicates (same event from several publishers) so each story costs one call
+        with metrics.span("clustering"):
+            clusters = cluster_articles(candidates)
+        multi = [c for c in clusters if len(c) > 1]
+        print(f"Clustering: {len(candidates)} articles -> {len(clusters)} stories ({len(multi)} multi-source clusters)")
         
-        # Deduplicate by link
-        seen = set()
-        final_list = []
-        for art in diverse_selection:
-            if art['link'] not in seen:
-                final_list.append(art)
-                seen.add(art['link'])
-
-        final_reel_stories = final_list[:15]
+        # Every analyzed story keeps its first member's link, so that marks the cluster as done
+        todo = [c for c in clusters if not journal.has_article(c[0]['link'])]
+        if len(todo) < len(clusters):
+            print(f"Resuming: {len(clusters) - len(todo)} stories already analyzed in this run.")
+        todo = self.prioritize(todo)
+
+        # Gemini pacing is handled by the agent's token-bucket limiter (GEMINI_RPM / GEMINI_TPM)
+        # Leftovers from an earlier attempt that never reached Supabase
+        writer.extend(journal.articles(pending_only=True))
         
-        reel_content = {
-            "title": f"The Daily Pulse • {datetime.datetime.now().strftime('%I:%M %p')}",
-            "summary": "Your live high-signal update.",
-            "stories": final_reel_stories
-        }
-        db.save_morning_reel(reel_content)
-
-    # Feature 10: Watchlist Alerts
-    # -----------------------------------
-    print("\n--- FEATURE 10: CHECKING WATCHLISTS ---")
-    watchlists = db.get_all_watchlists() # List of {token, keyword}
-    for watch_rule in watchlists:
-        keyword = watch_rule.get('keyword', '').lower()
-        token = watch_rule.get('user_fcm_token')
+        print(f"Analyzing {len(todo)} stories in chunks of {ANALYSIS_CHUNK_SIZE}...")
+        self.stories_attempted = self.stories_failed = 0
+        for i in range(0, len(todo), ANALYSIS_CHUNK_SIZE):
+            chunk = todo[i:i + ANALYSIS_CHUNK_SIZE]
+            with metrics.span("analysis"):
+                results = self.intel.analyze_clusters(chunk)
+            
+            # Failed analyses wait for the next run instead of shipping the heuristic downgrade;
+            # their backlog rows stay, so push() counts this attempt on top of the earlier ones
+            self.stories_attempted += len(results)
+            failed = [a for a in results if a.get("_unanalyzed")]
+            results = [a for a in results if not a.get("_unanalyzed")]
+            failed_links = {a['link'] for a in failed}
+            self.backlog.remove(a['link'] for c in chunk for a in c if a['link'] not in failed_links)
+            given_up = self.backlog.push(failed, failed=True)
+            self.stories_failed += len(failed)
+            metrics.incr("stories_requeued", len(failed) - len(given_up))
+            
+            # Checkpoint, then stream to the DB: a crash now wastes at most one chunk
+            journal.save_articles(results + given_up)
+            with metrics.span("upload"):
+                writer.extend(results + given_up)
+            
+            if failed and not results:
+                # Nothing in the chunk got through (quota gone): keep the rest for the next run
+                rest = todo[i + ANALYSIS_CHUNK_SIZE:]
+                if rest:
+                    self.backlog.push(a for c in rest for a in c)
+                    print(f"Backlog: analysis is failing, deferring the remaining {len(rest)} stories.")
+                    metrics.incr("stories_deferred", len(rest))
+                break
+        return journal.articles()
+
+    def fallback(self, journal: RunJournal, processed_articles: list, writer) -> list:
+        """Tops up from NewsData.io when Gemini failed on most of the stories analyze() sent it."""
+        # Check for Critical Failure (Gemini Down): analyze() counts the stories that came back _unanalyzed
+        fail_count = self.stories_failed
+        if fail_count:
+            print(f"Gemini Failed on {fail_count} of {self.stories_attempted} stories. Marking for Fallback...")
+
+        # Fallback Mechanism
+        if fail_count > self.stories_attempted * 0.5 and not journal.stage_done("fallback"): # If >50% failed
+            print("\n!!! GEMINI CRITICAL FAILURE DETECTED !!!")
+            print("Falling back to Tier 1 (NewsData.io)...")
+            with metrics.span("fallback"):
+                tier1_articles = self.ingestion.fetch_newsdata()
+
+            # 4. Final Deduplication (Safeguard against Tier 1 overlaps)
+            seen_links = {canonical_url(a['link']) for a in processed_articles}
+            tier1_articles = [a for a in tier1_articles if canonical_url(a['link']) not in seen_links]
+            tier1_articles = list({canonical_url(a['link']): a for a in tier1_articles}.values())
+            journal.save_articles(tier1_articles) # Add Tier 1 (Pre-trusted)
+            writer.extend(tier1_articles)
+            journal.save_stage("fallback")
+            processed_articles = journal.articles()
+        return processed_articles
+
+    def upload(self, writer):
+        """Flushes whatever the writer still buffers."""
+        with metrics.span("upload"):
+            failed = writer.close()
+        metrics.incr("articles_uploaded", len(writer.uploaded))
+        if failed and not writer.uploaded:
+            # Nothing at all got through: that's an outage/config problem, not a bad row
+            raise RuntimeError(f"Upload failed for all {len(failed)} articles") # Fail the GitHub Action so we see it
+
+    def publish(self):
+        with metrics.span("publish"):
+            publish_feed_snapshots(self.db, self.ingestion.categories())
+
+    def reel(self, processed_articles: list):
+        # Strategy: Fetch top 1 article from each known category in the last 24h from DB
+        # This ensures diversity even if the current ingestion batch was homogenous
+        with metrics.span("reel"):
+            final_reel_stories = build_reel_stories(self.db, self.ingestion.categories(), processed_articles)
+            
+            reel_content = {
+                "title": f"The Daily Pulse • {datetime.datetime.now().strftime('%I:%M %p')}",
+                "summary": "Your live high-signal update.",
+                "stories": final_reel_stories
+            }
+            self.db.save_morning_reel(reel_content)
+
+    def watchlists(self, processed_articles: list):
+        with metrics.span("watchlists"):
+            watchlists = self.watchlist_rules() # List of {token, keyword}
+            engine = WatchlistEngine(watchlists)
+            hits = engine.match(processed_articles)
+            for token, matches in hits.items():
+                for keyword, art in matches:
+                    print(f"Watchlist Hit! {keyword} found in {art['title']}")
         
-        for art in processed_articles:
-            if keyword in art['title'].lower() or keyword in art.get('ai_summary', '').lower():
-                print(f"Watchlist Hit! {keyword} found in {art['title']}")
-                from push_notifier import send_targeted_notification
-                send_targeted_notification(
-                    token=token, 
-                    title=f"🔔 Alert: {keyword.capitalize()} News",
-                    body=f"Found in: {art['title']}"
-                )
-                break # Alert once per keyword per run to avoid spam
-
-    # 5. Send Push Notification (General)
-    print("\n--- STEP 4: PUSH NOTIFICATION ---")
-    if processed_articles:
+            # One alert per device, delivered in FCM batches
+            alerts = WatchlistEngine.build_alerts(hits)
+            metrics.incr("watchlist_alerts", len(alerts))
+            if alerts:
+                from push_notifier import send_targeted_batch
+                send_targeted_batch(alerts)
+
+    def notify(self, processed_articles: list):
         top_headline = processed_articles[0].get('title', 'New stories available')
-        send_news_notification(
-            article_count=len(processed_articles),
-            top_headline=top_headline
-        )
-    
-    # 6. Cleanup
-    print("\n--- STEP 5: CLEANUP ---")
-    db.purge_old_data(hours=48)
-    
-    print("\n=== PIPELINE COMPLETE ===")
+        with metrics.span("notification"):
+            send_news_notification(
+                article_count=len(processed_articles),
+                top_headline=top_headline
+            )
+
+    def cleanup(self):
+        with metrics.span("purge"):
+            self.db.purge_old_data(hours=48)
+
+def main(run_id: str = None, pipeline: Pipeline = None, raw_articles: list = None) -> str:
+    """Runs the pipeline and always emits a run report, even on early exit or crash."""
+    # GitHub re-runs keep GITHUB_RUN_ID, so a re-run resumes the failed attempt
+    run_id = run_id or os.getenv("BRIEF_RUN_ID") or os.getenv("GITHUB_RUN_ID") or uuid.uuid4().hex[:12]
+    metrics.reset(run_id)
+    status = "failed"
+    try:
+        pipeline = pipeline or Pipeline()
+        status = pipeline.run(RunJournal(run_id), raw_articles)
+    finally:
+        metrics.attach("http_hosts", shared_client().host_stats(reset=True))
+        if pipeline and pipeline._intel:
+            metrics.attach("llm_usage", pipeline._intel.usage.report(reset=True))
+        metrics.finish(status)
+    return status
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Daily Brief ingestion & intelligence pipeline")
+    parser.add_argument("--run-id", help="Resume (or name) a run; defaults to BRIEF_RUN_ID / GITHUB_RUN_ID")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Stay running: poll each source on its own interval and run on new articles (see daemon.py)")
+    args = parser.parse_args()
+    if args.daemon:
+        from daemon import run_daemon
+        run_daemon(Pipeline(), main)
+    else:
+        main(run_id=args.run_id)
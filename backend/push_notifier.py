@@ -5,14 +5,14 @@ Sends push notifications to all Brief. app users when new articles are available
 Uses Firebase Admin SDK with service account authentication.
 """
 
+import importlib.util
 import os
-try:
-    import firebase_admin
-    from firebase_admin import credentials, messaging
-    FIREBASE_AVAILABLE = True
-except ImportError:
+
+# The SDK itself is imported by init_firebase(), so runs that send nothing never load it
+FIREBASE_AVAILABLE = importlib.util.find_spec("firebase_admin") is not None
+if not FIREBASE_AVAILABLE:
     print("[FCM] WARNING: firebase_admin module not found. Notifications disabled.")
-    FIREBASE_AVAILABLE = False
+firebase_admin = credentials = messaging = None
 
 # Path to service account JSON (relative to this file)
 SERVICE_ACCOUNT_PATH = os.path.join(os.path.dirname(__file__), "firebase-service-account.json")
@@ -22,12 +22,14 @@ _firebase_initialized = False
 
 def init_firebase():
     """Initialize Firebase Admin SDK if not already done"""
-    global _firebase_initialized
+    global _firebase_initialized, firebase_admin, credentials, messaging
     if not FIREBASE_AVAILABLE:
         return False
 
     if not _firebase_initialized:
         try:
+            import firebase_admin
+            from firebase_admin import credentials, messaging
             cred = credentials.Certificate(SERVICE_ACCOUNT_PATH)
             firebase_admin.initialize_app(cred)
             _firebase_initialized = True
@@ -157,3 +159,47 @@ def send_targeted_notification(token: str, title: str, body: str):
     except Exception as e:
         print(f"[FCM] Failed to send targeted notification: {e}")
         return False
+
+
+# FCM accepts at most 500 messages per send_each call
+FCM_BATCH_LIMIT = 500
+
+def send_targeted_batch(alerts: list):
+    """
+    Feature 10: Send many Watchlist Alerts in as few FCM calls as possible.
+    `alerts` is a list of {token, title, body}. Returns the number delivered.
+    """
+    if not alerts:
+        return 0
+    if not init_firebase(): return 0
+    
+    sent = 0
+    for i in range(0, len(alerts), FCM_BATCH_LIMIT):
+        chunk = alerts[i:i + FCM_BATCH_LIMIT]
+        messages = [
+            messaging.Message(
+                token=alert["token"],
+                notification=messaging.Notification(
+                    title=alert["title"],
+                    body=alert["body"]
+                ),
+                android=messaging.AndroidConfig(
+                    priority="high",
+                    notification=messaging.AndroidNotification(
+                        channel_id="brief_alerts_channel", # Separate channel for alerts
+                        priority="high"
+                    )
+                )
+            )
+            for alert in chunk
+        ]
+        try:
+            response = messaging.send_each(messages)
+            sent += response.success_count
+            if response.failure_count:
+                print(f"[FCM] Watchlist batch: {response.failure_count}/{len(chunk)} failed")
+        except Exception as e:
+            print(f"[FCM] Failed to send watchlist batch: {e}")
+    
+    print(f"[FCM] Watchlist Alerts sent: {sent}/{len(alerts)}")
+    return sent
@@ -0,0 +1,182 @@
+"""
+Token-bucket rate limiting for Gemini calls.
+
+Replaces the fixed `time.sleep(4)` after every request: calls are admitted
+as fast as the RPM / TPM quota allows, several can be in flight at once, and
+429 / quota errors shrink the admitted rate until the API stops complaining.
+"""
+
+import os
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, TypeVar
+
+from instrumentation import metrics
+
+T = TypeVar("T")
+
+# Gemini free tier defaults; override per key/plan from the workflow env
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "15"))
+GEMINI_TPM = float(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "4"))
+
+
+class TokenBucket:
+    """Classic token bucket: `rate_per_minute` refill, holds at most `capacity`."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill(now)
+        # A single request larger than the bucket would never fit; let it drain the bucket instead
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Detects 429 / RESOURCE_EXHAUSTED without importing google.api_core."""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "resourceexhausted", "resource_exhausted", "quota", "rate limit"))
+
+
+class RateLimiter:
+    """
+    Admits requests against both an RPM and a TPM bucket.
+
+    On a 429 the admitted rate is halved (down to 10% of quota) and everyone
+    pauses for the backoff window; each success restores 10% of the quota.
+    """
+
+    def __init__(self, rpm: float = GEMINI_RPM, tpm: float = GEMINI_TPM, burst: Optional[float] = None):
+        self.quota_rpm = rpm
+        self.quota_tpm = tpm
+        # Small default burst so a fresh run doesn't fire the whole minute's quota at once
+        self.requests = TokenBucket(rpm, capacity=burst if burst is not None else max(1.0, min(rpm, 4.0)))
+        self.tokens = TokenBucket(tpm)
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def acquire(self, estimated_tokens: int = 0):
+        """Blocks until one request of `estimated_tokens` fits both buckets."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                delay = max(
+                    self.paused_until - now,
+                    self.requests.wait_time(1, now),
+                    self.tokens.wait_time(estimated_tokens, now)
+                )
+                if delay <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(estimated_tokens)
+                    return
+                self._cond.wait(timeout=delay)
+
+    def report_success(self):
+        with self._cond:
+            self._set_rpm(min(self.quota_rpm, self.requests.rate * 60.0 + self.quota_rpm * 0.1))
+
+    def report_throttled(self, backoff_seconds: float):
+        with self._cond:
+            self._set_rpm(max(self.quota_rpm * 0.1, self.requests.rate * 60.0 / 2))
+            self.paused_until = max(self.paused_until, time.monotonic() + backoff_seconds)
+            self._cond.notify_all()
+
+    def _set_rpm(self, rpm: float):
+        self.requests._refill(time.monotonic())
+        self.requests.rate = rpm / 60.0
+
+    def call(self, fn: Callable[[], T], estimated_tokens: int = 0,
+             max_retries: int = GEMINI_MAX_RETRIES, base_delay: float = 2.0) -> T:
+        """
+        Runs `fn` under the limiter, retrying rate-limit errors with exponential
+        backoff plus full jitter. Any other error (or the last 429) is re-raised.
+        """
+        attempt = 0
+        while True:
+            self.acquire(estimated_tokens)
+            try:
+                result = fn()
+                self.report_success()
+                return result
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= max_retries:
+                    raise
+                backoff = random.uniform(0, base_delay * (2 ** attempt)) + base_delay
+                metrics.incr("llm_retries")
+                print(f"  [RateLimit] Throttled ({e.__class__.__name__}), retry {attempt + 1}/{max_retries} in {backoff:.1f}s")
+                self.report_throttled(backoff)
+                attempt += 1
+
+
+def estimate_tokens(text: str, expected_output_tokens: int = 0) -> int:
+    """Rough Gemini token estimate (~4 chars/token) used for TPM budgeting."""
+    return len(text) // 4 + expected_output_tokens
+
+
+class TokenUsage:
+    """
+    Actual token counts per Gemini call (the response's usage_metadata), totalled per
+    call kind for the run report. Calls without usage_metadata fall back to the estimate.
+    """
+
+    def __init__(self, max_log: int = 200):
+        self.max_log = max_log
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.kinds: Dict[str, Dict[str, int]] = {}
+            self.log: List[Dict] = []
+
+    def record(self, kind: str, response, articles: int = 1, estimated_prompt_tokens: int = 0) -> Dict:
+        usage = getattr(response, "usage_metadata", None)
+        prompt = getattr(usage, "prompt_token_count", None)
+        output = getattr(usage, "candidates_token_count", None)
+        entry = {
+            "kind": kind,
+            "articles": articles,
+            "prompt_tokens": prompt if prompt is not None else estimated_prompt_tokens,
+            "output_tokens": output if output is not None else estimate_tokens(getattr(response, "text", "") or ""),
+            "estimated": prompt is None or output is None,
+        }
+        with self._lock:
+            totals = self.kinds.setdefault(kind, {"calls": 0, "articles": 0, "prompt_tokens": 0, "output_tokens": 0})
+            totals["calls"] += 1
+            totals["articles"] += articles
+            totals["prompt_tokens"] += entry["prompt_tokens"]
+            totals["output_tokens"] += entry["output_tokens"]
+            if len(self.log) < self.max_log:
+                self.log.append(entry)
+        metrics.incr("llm_prompt_tokens", entry["prompt_tokens"])
+        metrics.incr("llm_output_tokens", entry["output_tokens"])
+        return entry
+
+    def report(self, reset: bool = False) -> Dict:
+        """Totals per kind and overall, tokens per article, and the first `max_log` calls."""
+        with self._lock:
+            kinds = {k: dict(v) for k, v in self.kinds.items()}
+            log = list(self.log)
+        if reset:
+            self.reset()
+        total = {key: sum(k[key] for k in kinds.values()) for key in ("calls", "prompt_tokens", "output_tokens")}
+        # Repair calls touch articles already counted by their first call
+        articles = sum(v["articles"] for k, v in kinds.items() if k != "repair")
+        total["tokens_per_article"] = round((total["prompt_tokens"] + total["output_tokens"]) / articles, 1) if articles else None
+        return {"total": total, "by_kind": kinds, "calls": log}
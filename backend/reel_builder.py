@@ -0,0 +1,87 @@
+"""
+Feature 9: The Morning Reel (diverse "best of latest" selection).
+
+The database does the per-category ranking in one round trip via the
+`reel_candidates` SQL function (see schema.sql). If that call fails, or returns
+too little, the same ranking is applied in-process to the current batch.
+
+Stories are stored in `daily_briefings.content` as references (id, link and the
+card fields) plus a short plain-text teaser, not copies of the full article.
+"""
+
+import html
+import re
+from typing import Dict, List
+
+# What each stored reel story carries; the full article stays in `articles` (by id/link)
+REEL_STORY_FIELDS = ["id", "title", "link", "source", "category", "published",
+                     "trust_score", "trust_badge", "icon", "teaser"]
+TEASER_CHARS = 240
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def teaser(text: str, limit: int = TEASER_CHARS) -> str:
+    """Plain-text lead of an (HTML) summary, cut at a word boundary."""
+    text = _SPACE_RE.sub(" ", html.unescape(_TAG_RE.sub(" ", text or ""))).strip()
+    if len(text) <= limit:
+        return text
+    cut = text[:limit].rsplit(" ", 1)[0] or text[:limit]
+    return cut.rstrip(" ,;:.") + "…"
+
+
+def story_ref(article: Dict) -> Dict:
+    """Reel entry for an article: reference fields plus its teaser."""
+    ref = {k: article[k] for k in REEL_STORY_FIELDS if k in article}
+    ref["teaser"] = teaser(article.get("teaser") or article.get("ai_summary") or article.get("summary"))
+    return ref
+
+
+def _score(article: Dict) -> int:
+    return article.get('trust_score') or 0
+
+
+def rank_best_per_category(articles: List[Dict], categories: List[str], per_category: int = 3) -> List[Dict]:
+    """
+    In-process twin of reel_candidates(): for each category take the `per_category`
+    most recent articles, then keep the highest trust_score among them.
+    """
+    by_category: Dict[str, List[Dict]] = {}
+    for art in articles:
+        by_category.setdefault(art.get('category'), []).append(art)
+
+    selection = []
+    for cat in categories:
+        latest = sorted(by_category.get(cat, []), key=lambda x: x.get('published') or '', reverse=True)[:per_category]
+        if latest:
+            # Stable sort keeps the most recent first among equal scores
+            selection.append(sorted(latest, key=_score, reverse=True)[0])
+    return selection
+
+
+def build_reel_stories(db, categories: List[str], current_batch: List[Dict],
+                       per_category: int = 3, max_stories: int = 15) -> List[Dict]:
+    """Picks one top story per category (DB first, current batch as fallback)."""
+    print("Fetching Top Story for each category from DB...")
+    diverse_selection = db.get_reel_candidates(categories, per_category=per_category)
+
+    if not diverse_selection:
+        print("Warning: DB reel query empty. Ranking current batch in-process.")
+        diverse_selection = rank_best_per_category(current_batch, categories, per_category)
+
+    # If DB fetch yields too few, fallback to current batch top scorers
+    if len(diverse_selection) < 3:
+        print("Warning: DB Diversity fetch low. Falling back to mixed mode.")
+        sorted_current = sorted(current_batch, key=_score, reverse=True)
+        diverse_selection = diverse_selection + sorted_current[:3]
+
+    # Deduplicate by link
+    seen = set()
+    final_list = []
+    for art in diverse_selection:
+        if art['link'] not in seen:
+            final_list.append(story_ref(art))
+            seen.add(art['link'])
+
+    return final_list[:max_stories]
@@ -0,0 +1,97 @@
+"""
+Retention for the 'articles' table.
+
+Old articles are purged in bounded batches instead of one unbounded delete:
+each batch selects the oldest ids past the cutoff (served by
+articles_published_idx), optionally archives those rows, then deletes them by
+id. The cutoff is computed in UTC, the same way fetch_rss_feed writes
+`published`.
+
+Tuning:
+- RETENTION_BATCH_SIZE:  rows per delete (ids go in the query string, so keep it modest)
+- RETENTION_MAX_BATCHES: cap per run; whatever is left is picked up next run
+- RETENTION_ARCHIVE_DIR: if set, purged rows are appended to
+  <dir>/articles-YYYY-MM-DD.jsonl.gz before they are deleted
+"""
+
+import datetime
+import gzip
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from instrumentation import metrics
+
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "200"))
+RETENTION_MAX_BATCHES = int(os.getenv("RETENTION_MAX_BATCHES", "100"))
+RETENTION_ARCHIVE_DIR = os.getenv("RETENTION_ARCHIVE_DIR")
+
+
+def utc_cutoff(hours: float, now: Optional[datetime.datetime] = None) -> str:
+    """ISO timestamp `hours` before now, in UTC (matches the stored `published` format)."""
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    return (now - datetime.timedelta(hours=hours)).astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class ArticleArchive:
+    """Appends purged rows to a gzip-compressed JSONL file per UTC day."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self) -> str:
+        day = datetime.datetime.now(datetime.timezone.utc).strftime('%Y-%m-%d')
+        return os.path.join(self.directory, f"articles-{day}.jsonl.gz")
+
+    def write(self, rows: List[Dict]):
+        # Appending adds a new gzip member; readers (gzip.open, zcat) see one stream
+        with gzip.open(self.path(), "at", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, default=str) + "\n")
+
+
+def purge_articles(client, hours: float = 48, batch_size: int = RETENTION_BATCH_SIZE,
+                   max_batches: int = RETENTION_MAX_BATCHES,
+                   archive: Optional[ArticleArchive] = None) -> Dict:
+    """
+    Deletes articles published more than `hours` ago, oldest first, in batches.
+    Returns a report: cutoff, total rows, per-batch rows/seconds, and any error.
+    """
+    cutoff = utc_cutoff(hours)
+    report = {"cutoff": cutoff, "rows": 0, "archived": 0, "batches": [], "error": None}
+    columns = "*" if archive else "id"
+
+    for n in range(max_batches):
+        start = time.perf_counter()
+        try:
+            rows = client.table("articles").select(columns)\
+                .lt("published", cutoff)\
+                .order("published")\
+                .limit(batch_size)\
+                .execute().data
+            if not rows:
+                break
+            if archive:
+                archive.write(rows)
+                report["archived"] += len(rows)
+            client.table("articles").delete().in_("id", [r['id'] for r in rows]).execute()
+        except Exception as e:
+            # Stop here; the rows that are left get another chance on the next run
+            report["error"] = str(e)
+            print(f"Purge batch {n + 1} failed: {e}")
+            break
+
+        elapsed = time.perf_counter() - start
+        report["rows"] += len(rows)
+        report["batches"].append({"rows": len(rows), "seconds": round(elapsed, 3)})
+        metrics.incr("purge_batches")
+        print(f"Purge batch {n + 1}: {len(rows)} rows in {elapsed:.2f}s")
+        if len(rows) < batch_size:
+            break
+    else:
+        print(f"Purge stopped after {max_batches} batches; the rest is left for the next run.")
+
+    metrics.incr("articles_purged", report["rows"])
+    return report
@@ -0,0 +1,122 @@
+"""
+Run journal for checkpointed, resumable pipeline runs.
+
+A local SQLite file records each stage's output and every analyzed article as
+soon as it completes, plus whether it has reached Supabase. Restarting with the
+same run id (e.g. a GitHub Actions re-run, which keeps GITHUB_RUN_ID) skips the
+work that already finished and only uploads what is still pending. Articles
+are keyed by their canonical link (url_canon.py), so two spellings of one
+story are one entry.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from local_state import state_path
+from url_canon import canonical_url
+
+# Journals older than this are dropped when a new run opens the file
+JOURNAL_RETENTION_HOURS = float(os.getenv("JOURNAL_RETENTION_HOURS", "72"))
+
+
+class RunJournal:
+    def __init__(self, run_id: str, path: Optional[str] = None):
+        self.run_id = run_id
+        self.path = path or state_path("run_journal.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            create table if not exists journal_stages (
+                run_id text not null,
+                stage text not null,
+                output text,
+                completed_at real not null,
+                primary key (run_id, stage)
+            );
+            create table if not exists journal_articles (
+                run_id text not null,
+                link text not null,
+                seq integer not null,
+                article text not null,
+                uploaded integer not null default 0,
+                primary key (run_id, link)
+            );
+        """)
+        self._prune()
+        self._conn.commit()
+
+    def _prune(self):
+        cutoff = time.time() - JOURNAL_RETENTION_HOURS * 3600
+        old_runs = [r[0] for r in self._conn.execute(
+            "select distinct run_id from journal_stages where completed_at < ? and run_id != ?", (cutoff, self.run_id)
+        )]
+        for run_id in old_runs:
+            self._conn.execute("delete from journal_stages where run_id = ?", (run_id,))
+            self._conn.execute("delete from journal_articles where run_id = ?", (run_id,))
+
+    # --- Stages ---
+
+    def stage_done(self, stage: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "select 1 from journal_stages where run_id = ? and stage = ?", (self.run_id, stage)
+            ).fetchone() is not None
+
+    def get_stage(self, stage: str) -> Optional[Any]:
+        """Output recorded for a finished stage, or None if it hasn't finished."""
+        with self._lock:
+            row = self._conn.execute(
+                "select output from journal_stages where run_id = ? and stage = ?", (self.run_id, stage)
+            ).fetchone()
+        return json.loads(row[0]) if row and row[0] is not None else None
+
+    def save_stage(self, stage: str, output: Any = None):
+        with self._lock:
+            self._conn.execute(
+                "insert or replace into journal_stages (run_id, stage, output, completed_at) values (?, ?, ?, ?)",
+                (self.run_id, stage, json.dumps(output) if output is not None else None, time.time())
+            )
+            self._conn.commit()
+
+    # --- Articles ---
+
+    def has_article(self, link: str) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "select 1 from journal_articles where run_id = ? and link = ?", (self.run_id, canonical_url(link))
+            ).fetchone() is not None
+
+    def save_articles(self, articles: List[Dict]):
+        """Records analyzed articles (one transaction, so a chunk is all-or-nothing)."""
+        with self._lock:
+            seq = self._conn.execute(
+                "select coalesce(max(seq), 0) from journal_articles where run_id = ?", (self.run_id,)
+            ).fetchone()[0]
+            for art in articles:
+                seq += 1
+                self._conn.execute(
+                    "insert or replace into journal_articles (run_id, link, seq, article, uploaded) values (?, ?, ?, ?, 0)",
+                    (self.run_id, canonical_url(art['link']), seq, json.dumps(art))
+                )
+            self._conn.commit()
+
+    def articles(self, pending_only: bool = False) -> List[Dict]:
+        """This run's analyzed articles in completion order."""
+        query = "select article from journal_articles where run_id = ?"
+        if pending_only:
+            query += " and uploaded = 0"
+        with self._lock:
+            rows = self._conn.execute(query + " order by seq", (self.run_id,)).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def mark_uploaded(self, links: List[str]):
+        with self._lock:
+            self._conn.executemany(
+                "update journal_articles set uploaded = 1 where run_id = ? and link = ?",
+                [(self.run_id, canonical_url(link)) for link in links]
+            )
+            self._conn.commit()
@@ -8,16 +8,36 @@ create table articles (
   category text,
   trust_badge text,
   icon text,
-  link text unique not null,
+  link text not null,
   ai_summary text,
   tier integer,
   
   -- New Columns for Features 5 & 7 (Fact Check & Synthesis)
   trust_score integer,      -- 0-100 Score
   trust_reason text,        -- AI Explanation for score
-  related_links text[]      -- Array of links if merged from multiple sources
+  related_links text[],     -- Array of links if merged from multiple sources
+  label_source text,        -- Who set badge/icon: llm, model (backend/label_model.py), default, heuristic, newsdata
+  
+  -- Dedup: link stays the publisher's URL; canonical_link is its canonical form (backend/url_canon.py),
+  -- hashed the same way as url_canon.link_key (rows without one fall back to link)
+  canonical_link text,
+  link_key text generated always as (md5(coalesce(canonical_link, link))) stored
 );
 
+create unique index articles_link_key_idx on articles (link_key);
+
+-- link_key is the only dedup key. Tables created when `link` was `unique` drop that constraint
+-- (Postgres names it articles_link_key); otherwise a row from before canonical_link existed
+-- (link_key = md5(link)) makes the upsert of the same raw link fail instead of adding a row
+-- that the 48h retention purge (backend/retention.py) removes with the old one.
+alter table articles drop constraint if exists articles_link_key;
+
+-- Retention: batched purge selects the oldest rows past the cutoff (backend/retention.py)
+create index articles_published_idx on articles (published);
+
+-- Dedup lookups against links merged into synthesized stories (&& overlap)
+create index articles_related_links_idx on articles using gin (related_links);
+
 -- Feature 9: The Morning Reel (Big Three)
 create table daily_briefings (
   id uuid default gen_random_uuid() primary key,
@@ -26,6 +46,42 @@ create table daily_briefings (
   date_str text unique      -- e.g. "2024-01-27"
 );
 
+-- Feature 9: Best story per category in one query.
+-- Takes the N most recent articles of each category, then the highest trust_score
+-- among them, and returns only the columns the reel renders. Instead of the full
+-- HTML ai_summary it returns a plain-text teaser (slightly longer than
+-- reel_builder.TEASER_CHARS, which then cuts it at a word boundary).
+create index articles_category_published_idx on articles (category, published desc);
+
+-- `create or replace` cannot change the return type of an already-deployed function, so drop it first
+drop function if exists reel_candidates(text[], integer);
+create or replace function reel_candidates(categories text[], per_category integer default 3)
+returns table (
+  id uuid, title text, link text, source text, category text, published timestamptz,
+  trust_score integer, trust_badge text, icon text, teaser text
+)
+language sql stable
+as $$
+  select ranked.id, ranked.title, ranked.link, ranked.source, ranked.category, ranked.published,
+         ranked.trust_score, ranked.trust_badge, ranked.icon,
+         left(btrim(regexp_replace(regexp_replace(coalesce(ranked.ai_summary, ranked.summary, ''),
+                                                  '<[^>]+>', ' ', 'g'), '\s+', ' ', 'g')), 280) as teaser
+  from (
+    select latest.*,
+           row_number() over (partition by latest.category
+                              order by latest.trust_score desc nulls last, latest.published desc) as score_rank
+    from (
+      select a.*,
+             row_number() over (partition by a.category order by a.published desc) as recency_rank
+      from articles a
+      where a.category = any(categories)
+    ) latest
+    where latest.recency_rank <= per_category
+  ) ranked
+  where ranked.score_rank = 1
+  order by array_position(categories, ranked.category);
+$$;
+
 -- Feature 10: Watchlist Keywords
 create table user_watchlists (
   id uuid default gen_random_uuid() primary key,
@@ -34,11 +90,25 @@ create table user_watchlists (
   created_at timestamptz default now()
 );
 
+-- Per-run timing and counters (see backend/instrumentation.py)
+create table pipeline_runs (
+  id uuid default gen_random_uuid() primary key,
+  run_id text unique not null,
+  status text,
+  started_at timestamptz,
+  duration_seconds real,
+  report jsonb
+);
+
 -- RLS policies for new tables (Open read for now)
 alter table daily_briefings enable row level security;
 create policy "Anon read briefings" on daily_briefings for select using (true);
 create policy "Service write briefings" on daily_briefings for insert with check (true);
 
+alter table pipeline_runs enable row level security;
+create policy "Service write runs" on pipeline_runs for insert with check (true);
+create policy "Service update runs" on pipeline_runs for update using (true);
+
 alter table user_watchlists enable row level security;
 create policy "Anon insert watchlist" on user_watchlists for insert with check (true);  
 create policy "Anon select own watchlist" on user_watchlists for select using (true);
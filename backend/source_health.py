@@ -0,0 +1,238 @@
+"""
+Per-source health and the adaptive source scheduler.
+
+Every fetch records the source's latency, whether it failed and how many fresh
+entries it returned; the dedup filter then records how many of those were
+already in the DB. Each number is kept as an exponentially weighted average in
+SQLite next to the other pipeline state, so it carries across runs.
+
+SourceScheduler uses them to decide, per run:
+- which feeds to poll: one per category first (the healthiest), so coverage
+  stays fair, then the rest of INGEST_SOURCE_BUDGET by expected new articles
+  per second; feeds that haven't been polled for a while score higher, so
+  quiet ones are still checked now and then
+- which feeds to leave alone: after consecutive failures a feed backs off
+  exponentially (SOURCE_BACKOFF_MINUTES, doubling, capped at 6h)
+- how many entries to take from each: enough to cover the new articles it
+  usually has, instead of a fixed 7 (SOURCE_MIN_ENTRIES..SOURCE_MAX_ENTRIES)
+
+Feeds without history are always polled first so they get one.
+"""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from feed_stream import FEED_MAX_ENTRIES
+from local_state import state_path
+
+INGEST_SOURCE_BUDGET = int(os.getenv("INGEST_SOURCE_BUDGET", "14"))
+SOURCE_MIN_ENTRIES = int(os.getenv("SOURCE_MIN_ENTRIES", "3"))
+SOURCE_MAX_ENTRIES = int(os.getenv("SOURCE_MAX_ENTRIES", "20"))
+SOURCE_REVISIT_HOURS = float(os.getenv("SOURCE_REVISIT_HOURS", "6"))
+SOURCE_BACKOFF_MINUTES = float(os.getenv("SOURCE_BACKOFF_MINUTES", "30"))
+
+# Weight of the newest observation in every moving average
+EWMA_ALPHA = 0.3
+MAX_BACKOFF_SECONDS = 6 * 3600
+
+
+def _ewma(old: Optional[float], value: float) -> float:
+    return value if old is None else old + EWMA_ALPHA * (value - old)
+
+
+class SourceHealth:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or state_path("source_health.sqlite3")
+        # Fetches run on a thread pool, so share one connection behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("""
+            create table if not exists source_health (
+                url text primary key,
+                polls integer not null default 0,
+                errors integer not null default 0,
+                consecutive_errors integer not null default 0,
+                latency real,
+                error_rate real,
+                fresh real,
+                duplicate_rate real,
+                last_polled real,
+                last_error text
+            )
+        """)
+        self._conn.commit()
+
+    def _upsert(self, url: str):
+        self._conn.execute("insert or ignore into source_health (url) values (?)", (url,))
+
+    def record_fetch(self, url: str, seconds: float, fresh: Optional[int] = None, error: Optional[str] = None):
+        """
+        One poll of `url`: how long it took, how many fresh entries it gave, or why it failed.
+        `fresh=None` means the feed was unchanged (304 / same content), which leaves its yield alone.
+        """
+        with self._lock:
+            self._upsert(url)
+            row = self._conn.execute("select * from source_health where url = ?", (url,)).fetchone()
+            failed = error is not None
+            self._conn.execute(
+                "update source_health set polls = polls + 1, errors = errors + ?, consecutive_errors = ?, "
+                "latency = ?, error_rate = ?, fresh = ?, last_polled = ?, last_error = ? where url = ?",
+                (
+                    int(failed),
+                    row["consecutive_errors"] + 1 if failed else 0,
+                    _ewma(row["latency"], seconds),
+                    _ewma(row["error_rate"], float(failed)),
+                    # A failed or unchanged poll says nothing about how much the feed publishes
+                    row["fresh"] if failed or fresh is None else _ewma(row["fresh"], fresh),
+                    time.time(),
+                    error if failed else row["last_error"],
+                    url,
+                )
+            )
+            self._conn.commit()
+
+    def record_duplicates(self, url: str, seen: int, duplicates: int):
+        """How many of the entries fetched from `url` were already in the DB."""
+        if seen <= 0:
+            return
+        with self._lock:
+            self._upsert(url)
+            row = self._conn.execute("select duplicate_rate from source_health where url = ?", (url,)).fetchone()
+            self._conn.execute("update source_health set duplicate_rate = ? where url = ?",
+                               (_ewma(row["duplicate_rate"], duplicates / seen), url))
+            self._conn.commit()
+
+    def get(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute("select * from source_health where url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def all(self) -> Dict[str, Dict]:
+        with self._lock:
+            rows = self._conn.execute("select * from source_health").fetchall()
+        return {row["url"]: dict(row) for row in rows}
+
+
+class SourceScheduler:
+    def __init__(self, health: Optional[SourceHealth] = None, budget: int = INGEST_SOURCE_BUDGET,
+                 min_entries: int = SOURCE_MIN_ENTRIES, max_entries: int = SOURCE_MAX_ENTRIES,
+                 revisit_hours: float = SOURCE_REVISIT_HOURS, backoff_minutes: float = SOURCE_BACKOFF_MINUTES):
+        self.health = health or SourceHealth()
+        self.budget = budget
+        self.min_entries = min_entries
+        self.max_entries = max_entries
+        self.revisit_hours = revisit_hours
+        self.backoff_minutes = backoff_minutes
+
+    # --- Per-source numbers ---
+
+    @staticmethod
+    def new_per_poll(stats: Dict) -> float:
+        """Fresh entries that turned out not to be in the DB yet, per poll."""
+        return (stats["fresh"] or 0.0) * (1 - (stats["duplicate_rate"] or 0.0))
+
+    def backoff_until(self, stats: Dict) -> float:
+        failures = stats["consecutive_errors"]
+        if not failures or not stats["last_polled"]:
+            return 0.0
+        delay = min(self.backoff_minutes * 60 * 2 ** (failures - 1), MAX_BACKOFF_SECONDS)
+        return stats["last_polled"] + delay
+
+    def backed_off(self, source: Dict, now: Optional[float] = None) -> bool:
+        stats = self.health.get(source["url"])
+        return bool(stats) and self.backoff_until(stats) > (time.time() if now is None else now)
+
+    def score(self, stats: Optional[Dict], now: float) -> float:
+        """Expected new articles per second of fetch time, boosted the longer a feed goes unpolled."""
+        if stats is None or not stats["polls"]:
+            return math.inf
+        reliability = 1 - (stats["error_rate"] or 0.0)
+        # +0.5 so a feed that went quiet isn't scored to zero forever
+        per_second = (self.new_per_poll(stats) + 0.5) / max(stats["latency"] or 1.0, 0.2)
+        idle_hours = (now - (stats["last_polled"] or 0)) / 3600
+        return per_second * reliability * (1 + idle_hours / self.revisit_hours)
+
+    def entry_limit(self, url: str) -> int:
+        """Entries to take from `url` this poll: about 1.5x its usual new ones, plus headroom."""
+        stats = self.health.get(url)
+        if stats is None or stats["fresh"] is None:
+            return FEED_MAX_ENTRIES
+        # A feed that filled its limit may have had more; the headroom lets the limit grow
+        limit = math.ceil(self.new_per_poll(stats) * 1.5) + 2
+        return max(self.min_entries, min(self.max_entries, limit))
+
+    # --- Planning ---
+
+    def plan(self, sources: List[Dict], budget: Optional[int] = None, now: Optional[float] = None) -> List[Dict]:
+        """
+        The sources to poll this run (in their original order).
+        One per category comes first, the rest of the budget goes by score; backed-off feeds are skipped.
+        """
+        budget = self.budget if budget is None else budget
+        now = time.time() if now is None else now
+        stats = self.health.all()
+
+        ready = []
+        for i, source in enumerate(sources):
+            s = stats.get(source["url"])
+            if s and self.backoff_until(s) > now:
+                print(f"  Backing off {source.get('source', source['url'])} "
+                      f"({s['consecutive_errors']} failures in a row: {s['last_error']})")
+                continue
+            ready.append((self.score(s, now), i))
+        ready.sort(key=lambda t: (-t[0], t[1]))
+
+        chosen, covered = [], set()
+        for score, i in ready:
+            category = sources[i]["category"]
+            if category not in covered:
+                covered.add(category)
+                chosen.append((score, i))
+        # More categories than budget: the categories with the best feeds win this run
+        chosen = sorted(chosen, key=lambda t: (-t[0], t[1]))[:budget]
+
+        picked = {i for _, i in chosen}
+        for score, i in ready:
+            if len(picked) >= budget:
+                break
+            picked.add(i)
+        return [sources[i] for i in sorted(picked)]
+
+    def record_novelty(self, sources: Iterable[Dict], articles: List[Dict], existing_links: Iterable[str]):
+        """Feeds the dedup filter's answer back as each source's duplicate rate."""
+        url_by_name = {s.get("source"): s["url"] for s in sources}
+        existing = set(existing_links)
+        counts: Dict[str, List[int]] = {}
+        for article in articles:
+            url = url_by_name.get(article.get("source"))
+            if url:
+                seen_dup = counts.setdefault(url, [0, 0])
+                seen_dup[0] += 1
+                seen_dup[1] += article["link"] in existing
+        for url, (seen, duplicates) in counts.items():
+            self.health.record_duplicates(url, seen, duplicates)
+
+    def summary(self, sources: List[Dict]) -> List[Dict]:
+        """Per-source numbers for the run report, best first."""
+        stats = self.health.all()
+        now = time.time()
+        rows = []
+        for source in sources:
+            s = stats.get(source["url"])
+            if not s:
+                continue
+            rows.append({
+                "source": source.get("source"),
+                "score": round(self.score(s, now), 3),
+                "new_per_poll": round(self.new_per_poll(s), 2),
+                "latency": round(s["latency"] or 0.0, 2),
+                "error_rate": round(s["error_rate"] or 0.0, 2),
+                "duplicate_rate": round(s["duplicate_rate"] or 0.0, 2),
+                "entry_limit": self.entry_limit(source["url"]),
+            })
+        return sorted(rows, key=lambda r: -r["score"])
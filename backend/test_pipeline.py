@@ -1,5 +1,7 @@
+import datetime
 import os
 import sys
+from types import SimpleNamespace
 
 # Ensure backend directory is in path
 sys.path.append(os.path.join(os.getcwd(), 'backend'))
@@ -28,5 +30,172 @@ def test_ingestion():
     except Exception as e:
         print(f"❌ Ingestion Failed: {e}")
 
+def test_backlog_attempts():
+    print("\n3. Testing Backlog Retry Limit (offline)...")
+    import tempfile
+    from main import Pipeline
+    from backlog_queue import BacklogQueue
+    from run_journal import RunJournal
+    try:
+        tmp = tempfile.mkdtemp(prefix="brief-test-")
+        article = {"link": "https://example.com/story", "title": "A story that keeps failing analysis",
+                   "source": "Example", "category": "Technology",
+                   "published": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+        pipeline = Pipeline.__new__(Pipeline)
+        pipeline.backlog = BacklogQueue(path=os.path.join(tmp, "backlog.sqlite3"), max_attempts=3)
+        pipeline.db = SimpleNamespace(get_existing_links=lambda links: [])
+        pipeline._watchlists = []
+        # Every analysis fails, the way it does while the Gemini quota is gone
+        pipeline._intel = SimpleNamespace(analyze_clusters=lambda clusters: [
+            dict(c[0], _unanalyzed=True) for c in clusters])
+
+        shipped = []
+        for run in range(1, 4):
+            journal = RunJournal(f"test-run-{run}", path=os.path.join(tmp, "journal.sqlite3"))
+            writer = SimpleNamespace(extend=shipped.extend)
+            pipeline.analyze(journal, [dict(article)] if run == 1 else [], writer)
+            print(f"  Run {run}: {len(pipeline.backlog)} queued, {len(shipped)} given up")
+
+        if len(shipped) == 1 and len(pipeline.backlog) == 0:
+            print("✅ Success: The third failure was given up and shipped.")
+        else:
+            print("❌ Backlog kept retrying past BACKLOG_MAX_ATTEMPTS.")
+    except Exception as e:
+        print(f"❌ Backlog Test Failed: {e}")
+
+def test_clustering():
+    print("\n4. Testing Near-Duplicate Clustering (offline)...")
+    from clustering import cluster_articles
+    try:
+        articles = [
+            {"title": "NVIDIA unveils H200 GPU with 141GB of HBM3e memory for AI training",
+             "summary": "NVIDIA announced the H200 accelerator, its first GPU with HBM3e memory.", "source": "BBC"},
+            {"title": "City council approves new budget for public libraries",
+             "summary": "The council voted to expand library opening hours next year.", "source": "Local"},
+            {"title": "NVIDIA unveils H200 GPU with 141GB HBM3e memory for AI training",
+             "summary": "NVIDIA announced the H200 accelerator, the first GPU with HBM3e memory.", "source": "CNBC"},
+        ]
+        clusters = cluster_articles(articles)
+        sources = [[a["source"] for a in c] for c in clusters]
+        if sources == [["BBC", "CNBC"], ["Local"]]:
+            print("✅ Success: Same story from two publishers grouped, unrelated story left alone.")
+        else:
+            print(f"❌ Unexpected clusters: {sources}")
+    except Exception as e:
+        print(f"❌ Clustering Test Failed: {e}")
+
+def test_watchlist_matcher():
+    print("\n5. Testing Watchlist Matcher (offline)...")
+    from watchlist_engine import AhoCorasick
+    try:
+        # Overlapping keywords ("he" inside "she"/"hers") exercise the failure links
+        patterns = ["he", "she", "his", "hers", "nvidia", "gpu"]
+        matcher = AhoCorasick(patterns)
+        cases = {
+            "ushers": {"he", "she", "hers"},
+            "nvidia ships a new gpu": {"nvidia", "gpu"},
+            "nothing relevant": set(),
+        }
+        wrong = {}
+        for text, expected in cases.items():
+            found = {patterns[i] for i in matcher.find_all(text)}
+            # Same answer as the substring check it replaced
+            if found != expected or found != {p for p in patterns if p in text}:
+                wrong[text] = found
+        if not wrong:
+            print("✅ Success: Every keyword found, including overlapping ones.")
+        else:
+            print(f"❌ Wrong matches: {wrong}")
+    except Exception as e:
+        print(f"❌ Watchlist Test Failed: {e}")
+
+def test_upload_bisection():
+    print("\n6. Testing Upload Bisection (offline)...")
+    from database_manager import ArticleWriter
+    from postgrest.exceptions import APIError
+    try:
+        calls = []
+
+        class FakeTable:
+            def upsert(self, rows, on_conflict=None):
+                self.rows = rows
+                return self
+
+            def execute(self):
+                calls.append(len(self.rows))
+                # Supabase rejects the whole statement if any row is bad
+                if any(r["title"] == "bad row" for r in self.rows):
+                    raise APIError({"code": "22P02", "message": "invalid input syntax"})
+
+        client = SimpleNamespace(table=lambda name: FakeTable())
+        writer = ArticleWriter(client, max_rows=100)
+        writer.extend([{"link": f"https://example.com/{i}", "title": "bad row" if i == 7 else "good row"}
+                       for i in range(20)])
+        failed = writer.close()
+
+        if [r["link"] for r in failed] == ["https://example.com/7"] and len(writer.uploaded) == 19:
+            print(f"✅ Success: The bad row was isolated in {len(calls)} requests, the other 19 uploaded.")
+        else:
+            print(f"❌ Failed rows: {[r['link'] for r in failed]}, uploaded {len(writer.uploaded)}")
+    except Exception as e:
+        print(f"❌ Upload Test Failed: {e}")
+
+def test_url_canon():
+    print("\n7. Testing URL Canonicalization (offline)...")
+    from url_canon import canonical_url, link_key
+    try:
+        direct = "https://www.example.com/news/story?id=42"
+        variants = [
+            "http://WWW.Example.com/news/story?utm_source=rss&id=42&fbclid=abc#comments",
+            "https://www.bing.com/news/apiclick.aspx?ref=FexRss&aid=&url=https%3A%2F%2Fwww.example.com%2Fnews%2Fstory%3Fid%3D42%26utm_medium%3Dfeed",
+            "https://www.google.com/url?q=x&url=https%3A%2F%2Fwww.example.com%2Fnews%2Fstory%3Fid%3D42",
+        ]
+        wrong = [v for v in variants if canonical_url(v) != canonical_url(direct) or link_key(v) != link_key(direct)]
+        # Parameters that pick the content are not tracking
+        distinct = canonical_url("https://www.example.com/news/story?id=43") != canonical_url(direct)
+        if not wrong and distinct and "utm_" not in canonical_url(variants[0]):
+            print("✅ Success: Redirect wrappers and tracking params fold into one link key.")
+        else:
+            print(f"❌ Not canonicalized: {[canonical_url(v) for v in wrong]} (distinct ids kept: {distinct})")
+    except Exception as e:
+        print(f"❌ URL Test Failed: {e}")
+
+def test_feed_stream():
+    print("\n8. Testing Streaming Feed Parser (offline)...")
+    from email.utils import format_datetime
+    from feed_stream import fresh_entries
+    try:
+        now = datetime.datetime.now(datetime.timezone.utc)
+        hours_old = [1, 2, 30, 3]  # The third entry is past the 24h window
+        items = "".join(
+            f"<item><title>Story {i}</title><link>https://example.com/{i}</link>"
+            f"<pubDate>{format_datetime(now - datetime.timedelta(hours=h))}</pubDate></item>"
+            for i, h in enumerate(hours_old)
+        )
+        body = f'<?xml version="1.0"?><rss version="2.0"><channel><title>t</title>{items}</channel></rss>'.encode()
+
+        # Fed in small chunks so the parser has to work incrementally; count what it pulled
+        pulled = []
+        def chunks():
+            for i in range(0, len(body), 64):
+                pulled.append(i)
+                yield body[i:i + 64]
+
+        links = [e["link"] for e in fresh_entries(chunks(), limit=10, max_age_hours=24, now=now)]
+        limited = [e["link"] for e in fresh_entries([body], limit=1, max_age_hours=24, now=now)]
+        if (links == ["https://example.com/0", "https://example.com/1"] and len(pulled) * 64 < len(body)
+                and limited == ["https://example.com/0"]):
+            print("✅ Success: Parsing stopped at the first stale entry without reading the rest.")
+        else:
+            print(f"❌ Got {links} (read {len(pulled) * 64}/{len(body)} bytes), limit=1 gave {limited}")
+    except Exception as e:
+        print(f"❌ Feed Parser Test Failed: {e}")
+
 if __name__ == "__main__":
     test_ingestion()
+    test_backlog_attempts()
+    test_clustering()
+    test_watchlist_matcher()
+    test_upload_bisection()
+    test_url_canon()
+    test_feed_stream()
@@ -0,0 +1,103 @@
+"""
+URL canonicalization for article dedup.
+
+The same story reaches us under many spellings: Bing News / Yahoo redirect
+wrappers, utm_* and other tracking parameters, http vs https, mixed-case hosts,
+fragments. `canonical_url` folds those into one form, stored as
+`articles.canonical_link` next to the publisher's original `link` (which is
+what the app opens); `link_key` is its compact hash (the `link_key` column in
+schema.sql is generated from canonical_link with the same md5).
+"""
+
+import base64
+import hashlib
+from functools import lru_cache
+from urllib.parse import parse_qsl, unquote, urlencode, urlsplit, urlunsplit
+
+# Aggregator redirect endpoints: (host suffix, path prefix) -> query param holding the target
+_REDIRECT_PARAMS = {
+    ("bing.com", "/news/apiclick.aspx"): "url",
+    ("bing.com", "/ck/a"): "u",
+    ("news.yahoo.com", "/redirect"): "url",
+    ("google.com", "/url"): "url",
+    ("news.google.com", "/url"): "url",
+    ("l.facebook.com", "/l.php"): "u",
+}
+
+_TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl",
+    "ocid", "cmpid", "cmp", "ncid", "sr_share", "soc_src", "soc_trk", "ref_src", "ref_url",
+    "guccounter", "guce_referrer", "guce_referrer_sig", "at_medium", "at_campaign", "at_custom1",
+    "at_custom2", "at_custom3", "at_custom4", "taid", "ito", "mbid", "smid", "rss", "feedtype",
+    "__twitter_impression",
+}
+_TRACKING_PREFIXES = ("utm_", "pk_", "mtm_", "hsa_", "oly_")
+
+_DEFAULT_PORTS = {":80", ":443"}
+
+
+def _unwrap_redirect(parts) -> str:
+    """Returns the wrapped target URL if `parts` is a known aggregator redirect, else ''."""
+    host = parts.netloc.lower()
+    for (suffix, path_prefix), param in _REDIRECT_PARAMS.items():
+        if (host == suffix or host.endswith("." + suffix)) and parts.path.lower().startswith(path_prefix):
+            for key, value in parse_qsl(parts.query, keep_blank_values=False):
+                if key.lower() == param:
+                    # Bing /ck/a encodes the target as "a1" + base64
+                    if value.startswith("a1") and not value.startswith("a1http"):
+                        try:
+                            value = base64.urlsafe_b64decode(value[2:] + "=" * (-len(value[2:]) % 4)).decode("utf-8")
+                        except Exception:
+                            return ""
+                    value = unquote(value) if "%3a" in value.lower() else value
+                    if value.lower().startswith(("http://", "https://")):
+                        return value
+    # Yahoo search wrappers: r.search.yahoo.com/_ylt=.../RU=<encoded target>/RK=...
+    if host.endswith("r.search.yahoo.com") and "/RU=" in parts.path:
+        target = unquote(parts.path.split("/RU=", 1)[1].split("/", 1)[0])
+        if target.lower().startswith(("http://", "https://")):
+            return target
+    return ""
+
+
+@lru_cache(maxsize=65536)
+def canonical_url(url: str) -> str:
+    """
+    Canonical form of an article URL:
+    redirect wrappers unwrapped, https, lowercase host without default port,
+    tracking params removed, remaining params sorted, no fragment.
+    """
+    url = (url or "").strip()
+    if not url:
+        return url
+
+    parts = urlsplit(url)
+    for _ in range(3):  # Wrappers can be nested (e.g. Bing -> Google -> publisher)
+        target = _unwrap_redirect(parts)
+        if not target:
+            break
+        parts = urlsplit(target.strip())
+
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https"):
+        return url  # Not a web link; leave untouched
+
+    netloc = parts.netloc.lower()
+    if "@" in netloc:
+        netloc = netloc.rsplit("@", 1)[1]
+    for port in _DEFAULT_PORTS:
+        if netloc.endswith(port):
+            netloc = netloc[:-len(port)]
+    netloc = netloc.rstrip(".")
+
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in _TRACKING_PARAMS and not k.lower().startswith(_TRACKING_PREFIXES)
+    )
+
+    return urlunsplit(("https", netloc, parts.path or "/", urlencode(query, doseq=True), ""))
+
+
+def link_key(url: str) -> str:
+    """Compact dedup key: md5 hex of the canonical URL (matches articles.link_key)."""
+    return hashlib.md5(canonical_url(url).encode("utf-8")).hexdigest()
@@ -0,0 +1,112 @@
+"""
+Feature 10: Watchlist matching with an Aho-Corasick automaton.
+
+All keywords are compiled once, each article is scanned a single time, and hits
+are grouped per device token so alerts can go out as one FCM batch.
+Matching keeps the original semantics: case-insensitive substring match on the
+title or AI summary, and each (token, keyword) rule fires at most once per run.
+"""
+
+from collections import deque
+from typing import Dict, List, Tuple
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher: scan cost is O(text + matches)."""
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[int]] = [[]]
+
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for ch in pattern:
+                nxt = self.goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[node][ch] = nxt
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                node = nxt
+            self.output[node].append(pattern_id)
+
+        # BFS to wire failure links; outputs inherit their fail target's outputs
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+
+    def find_all(self, text: str) -> set:
+        """Returns the ids of every pattern that occurs in `text`."""
+        found = set()
+        node = 0
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            if self.output[node]:
+                found.update(self.output[node])
+        return found
+
+
+class WatchlistEngine:
+    def __init__(self, watchlists: List[Dict]):
+        """`watchlists` are user_watchlists rows: {user_fcm_token, keyword}."""
+        self.subscribers: Dict[str, set] = {}
+        for rule in watchlists:
+            keyword = (rule.get('keyword') or '').strip().lower()
+            token = rule.get('user_fcm_token')
+            if keyword and token:
+                self.subscribers.setdefault(keyword, set()).add(token)
+        self.keywords = list(self.subscribers)
+        self.matcher = AhoCorasick(self.keywords)
+
+    def match(self, articles: List[Dict]) -> Dict[str, List[Tuple[str, Dict]]]:
+        """
+        Returns {token: [(keyword, first matching article), ...]}.
+        Articles are scanned in order, so each keyword maps to its earliest hit.
+        """
+        first_hit: Dict[int, Dict] = {}
+        if self.keywords:
+            for art in articles:
+                text = f"{art.get('title', '')}\n{art.get('ai_summary') or ''}".lower()
+                for keyword_id in self.matcher.find_all(text):
+                    first_hit.setdefault(keyword_id, art)
+
+        hits: Dict[str, List[Tuple[str, Dict]]] = {}
+        for keyword_id in sorted(first_hit):
+            keyword = self.keywords[keyword_id]
+            for token in self.subscribers[keyword]:
+                hits.setdefault(token, []).append((keyword, first_hit[keyword_id]))
+        return hits
+
+    def subscriber_count(self, text: str) -> int:
+        """Devices watching any keyword found in `text` (how many people a story would alert)."""
+        tokens = set()
+        for keyword_id in self.matcher.find_all(text.lower()):
+            tokens |= self.subscribers[self.keywords[keyword_id]]
+        return len(tokens)
+
+    @staticmethod
+    def build_alerts(hits: Dict[str, List[Tuple[str, Dict]]]) -> List[Dict]:
+        """One alert per device, summarizing every keyword that fired for it."""
+        alerts = []
+        for token, matches in hits.items():
+            keyword, art = matches[0]
+            if len(matches) == 1:
+                title = f"🔔 Alert: {keyword.capitalize()} News"
+                body = f"Found in: {art['title']}"
+            else:
+                title = f"🔔 Alert: {len(matches)} Watchlist Matches"
+                body = " • ".join(f"{k.capitalize()}: {a['title']}" for k, a in matches)
+            alerts.append({"token": token, "title": title, "body": body[:500]})
+        return alerts